@@ -2,10 +2,25 @@
 # Don't Remove Credit
 # Telegram Channel @RexBots_Official
 
+import re
+import time
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from database.db import db
+from utils.pool import user_pool
+from utils.file_cache import file_cache
+from utils.singleflight import transfers
+from utils.media_cache import media_cache
+from utils.progress import progress_bus
+from utils.scheduler import scheduler
+from utils.usage import usage
+from utils.entitlements import entitlements
+from utils.download import downloader
+from utils.upload import uploader
+from utils.jobs import job_store
+from utils.ratelimit import limiter
 from config import ADMINS, DB_URI
+from Rexbots.start import humanbytes
 
 @Client.on_message(filters.command("ban") & filters.user(ADMINS))
 async def ban(client: Client, message: Message):
@@ -14,6 +29,8 @@ async def ban(client: Client, message: Message):
     try:
         user_id = int(message.command[1])
         await db.ban_user(user_id)
+        scheduler.cancel(user_id)
+        await job_store.drop_users([user_id])
         await message.reply_text(f"**User {user_id} Banned Successfully 🚫**")
     except:
         await message.reply_text("Error banning user.")
@@ -32,6 +49,63 @@ async def unban(client: Client, message: Message):
 # Don't Remove Credit
 # Telegram Channel @RexBots_Official
 
+# Bulk Operations
+MAX_ID_FILE_SIZE = 5 * 1024 * 1024
+
+async def collect_user_ids(client: Client, message: Message, skip=1):
+    """
+    User ids for a bulk command: inline after the first `skip` words, plus any
+    found in the replied-to message (its text, or a .txt/.csv document). Only whole
+    whitespace/comma separated numeric tokens count, so dates or usernames with
+    digits in them are not taken for ids.
+    """
+    chunks = [" ".join(message.command[skip:])]
+    reply = message.reply_to_message
+    if reply:
+        if reply.document:
+            if reply.document.file_size > MAX_ID_FILE_SIZE:
+                raise ValueError("The id file is larger than 5 MB.")
+            data = await client.download_media(reply.document, in_memory=True)
+            chunks.append(bytes(data.getbuffer()).decode("utf-8", "ignore"))
+        else:
+            chunks.append(reply.text or reply.caption or "")
+    ids = []
+    seen = set()
+    for token in re.split(r"[\s,;]+", " ".join(chunks)):
+        token = token.strip("\"'")
+        if not re.fullmatch(r"\d+", token):
+            continue
+        user_id = int(token)
+        if user_id not in seen:
+            seen.add(user_id)
+            ids.append(user_id)
+    return ids
+
+def bulk_report(action, ids, result, started):
+    return (
+        f"**{action}**\n\n"
+        f"**Ids Given:** `{len(ids)}`\n"
+        f"**Matched:** `{result.matched_count}` | **Modified:** `{result.modified_count}`\n"
+        f"**Time:** `{(time.perf_counter() - started) * 1000:.0f} ms`"
+    )
+
+@Client.on_message(filters.command(["bulk_ban", "bulk_unban"]) & filters.user(ADMINS))
+async def bulk_ban(client: Client, message: Message):
+    banned = message.command[0] == "bulk_ban"
+    try:
+        ids = await collect_user_ids(client, message)
+    except Exception as e:
+        return await message.reply_text(f"**Error reading ids:** `{e}`")
+    if not ids:
+        return await message.reply_text(f"**Usage:** `/{message.command[0]} id1 id2 ...` or reply to a text/CSV file of ids")
+    started = time.perf_counter()
+    result = await db.bulk_set_banned(ids, banned)
+    if banned:
+        for user_id in ids:
+            scheduler.cancel(user_id)
+        await job_store.drop_users(ids)
+    await message.reply_text(bulk_report("Users Banned 🚫" if banned else "Users Unbanned ✅", ids, result, started))
+
 @Client.on_message(filters.command("set_dump") & filters.user(ADMINS))
 async def set_dump(client: Client, message: Message):
     if len(message.command) < 3:
@@ -48,6 +122,102 @@ async def set_dump(client: Client, message: Message):
 async def dblink(client: Client, message: Message):
     await message.reply_text(f"**DB URI:** `{DB_URI}`")
 
+@Client.on_message(filters.command("metrics") & filters.user(ADMINS))
+async def metrics(client: Client, message: Message):
+    pool = user_pool.stats()
+    files = file_cache.stats()
+    flights = transfers.stats()
+    disk = media_cache.stats()
+    bus = progress_bus.stats()
+    jobs = scheduler.stats()
+    queries = db.queries
+    users = db.user_cache_stats()
+    writes = usage.stats()
+    plans = entitlements.stats()
+    parallel = downloader.stats()
+    uploads = uploader.stats()
+    pacing = limiter.stats()
+    await message.reply_text(
+        "**📈 Engine Metrics**\n\n"
+        f"**Active Transfers:** `{bus['active']}` | **Status Edits:** `{bus['edits']}`\n\n"
+        "**Job Scheduler**\n"
+        f"Slots: `{jobs['running']} / {jobs['slots']}` | Queued: `{jobs['queued']}` (premium: `{jobs['queued_premium']}`)\n"
+        f"Wait: avg `{jobs['avg_wait']:.1f}s` | max `{jobs['max_wait']:.1f}s` | oldest queued `{jobs['oldest_wait']:.1f}s`\n"
+        f"Jobs Started: `{jobs['started']}` | Cancelled: `{jobs['cancels']}`\n"
+        f"Cancel to Free Slot: avg `{jobs['avg_cancel']:.2f}s` | max `{jobs['max_cancel']:.2f}s`\n\n"
+        "**User Session Pool**\n"
+        f"Hits: `{pool['hits']}` | Misses: `{pool['misses']}`\n"
+        f"Open Connections: `{pool['open']}` (in use: `{pool['in_use']}`)\n\n"
+        "**File ID Cache**\n"
+        f"Memory Hits: `{files['hits']}` | DB Hits: `{files['db_hits']}` | Misses: `{files['misses']}`\n"
+        f"Entries in Memory: `{files['entries']}`\n\n"
+        "**Parallel Downloads**\n"
+        f"Connections: `{parallel['connections']}` | Done: `{parallel['downloads']}` | Failed: `{parallel['failures']}` | FloodWaits: `{parallel['floods']}`\n"
+        f"Data: `{humanbytes(parallel['bytes'])}` | Resumed: `{parallel['resumed']}` (`{humanbytes(parallel['resumed_bytes'])}` reused)\n\n"
+        "**Parallel Uploads**\n"
+        f"Done: `{uploads['uploads']}` | Failed: `{uploads['failures']}` | FloodWaits: `{uploads['floods']}` | Data: `{humanbytes(uploads['bytes'])}`\n"
+        f"Speed: avg `{uploads['avg_speed'] / 1048576:.2f} MB/s` | last `{uploads['last_speed'] / 1048576:.2f} MB/s`\n\n"
+        "**Rate Limiter**\n"
+        f"Buckets: `{pacing['buckets']}` | FloodWaits slept by pyrogram: `{pacing['flood_sleeps']}`\n"
+        + "".join(
+            f"{kind}: `{c['calls']}` calls | delayed `{c['delayed']}` (avg `{c['avg_wait']:.2f}s`, max `{c['max_wait']:.1f}s`) | "
+            f"FloodWaits `{c['floods']}` | rate `{c['rate']:.1f}/s`\n"
+            for kind, c in pacing['classes'].items()
+        ) + "\n"
+        "**Coalesced Transfers**\n"
+        f"In Flight: `{flights['in_flight']}` | Leaders: `{flights['leaders']}` | Joined: `{flights['coalesced']}`\n"
+        f"Bytes Saved: `{humanbytes(flights['bytes_saved'])}`\n\n"
+        f"**MongoDB Commands:** `{queries.total()}` ("
+        + ", ".join(f"{name}: {count}" for name, count in sorted(queries.counts.items())) + ")\n\n"
+        "**User Cache**\n"
+        f"Hit Rate: `{users['hit_rate']:.1f}%` ({users['hits']} hits, {users['misses']} misses) | Entries: `{users['entries']}`\n\n"
+        "**Premium Table**\n"
+        f"Premium Users: `{plans['premium']}` (permanent: `{plans['permanent']}`) | Timers: `{plans['scheduled']}` | Expired: `{plans['expired']}`\n\n"
+        "**Usage Analytics**\n"
+        f"Pending Rows: `{writes['pending']}` | Flushes: `{writes['flushes']}` ({writes['flushed_rows']} rows) | Errors: `{writes['errors']}`\n\n"
+        "**Local Media Cache**\n"
+        + (
+            f"Usage: `{humanbytes(disk['bytes'])} / {humanbytes(disk['max_bytes'])}` ({disk['files']} files)\n"
+            f"Hit Rate: `{disk['hit_rate']:.1f}%` ({disk['hits']} hits, {disk['misses']} misses) | Evictions: `{disk['evictions']}`"
+            if disk['enabled'] else "Disabled"
+        )
+    )
+
+@Client.on_message(filters.command("jobs") & filters.user(ADMINS))
+async def jobs(client: Client, message: Message):
+    running = job_store.running()
+    live = {job["id"] for job in running}
+    stored = await db.get_jobs()
+    waiting = [doc for doc in stored if doc["_id"] not in live]
+    stats = job_store.stats()
+    lines = [
+        "**🗂 Batch Jobs**\n",
+        f"Running: `{stats['running']}` | Stored: `{len(stored)}` | Resumed after restart: `{stats['resumed']}` | Checkpoint writes: `{stats['writes']}`\n"
+    ]
+    for job in sorted(running, key=lambda job: job["rate"], reverse=True)[:20]:
+        lines.append(
+            f"▶️ `{job['user_id']}` at `{job['last_done']}` / `{job['to_id']}` ({job['left']} left) | "
+            f"`{job['done']}` msgs in `{job['elapsed'] / 60:.1f} min` | `{job['rate']:.1f} msgs/min`"
+        )
+    for doc in waiting[:20]:
+        position = doc['from_id'] if doc.get('last_done') is None else doc['last_done'] + 1
+        lines.append(f"⏳ `{doc['user_id']}` from `{position}` to `{doc['to_id']}` since `{doc['submitted']:%d %b %H:%M}`")
+    if len(running) + len(waiting) > 40:
+        lines.append("…")
+    await message.reply_text("\n".join(lines))
+
+@Client.on_message(filters.command("flush_cache") & filters.user(ADMINS))
+async def flush_cache(client: Client, message: Message):
+    if len(message.command) > 1:
+        try:
+            user_id = int(message.command[1])
+        except ValueError:
+            return await message.reply_text("**Usage:** `/flush_cache [user_id]`")
+        dropped = db.invalidate_user(user_id)
+        return await message.reply_text(f"**User {user_id} {'dropped from' if dropped else 'was not in'} the cache.**")
+    dropped = db.invalidate_user()
+    await message.reply_text(f"**User cache cleared ({dropped} entries).**")
+
 @Client.on_message(filters.command(["add_unsubscribe", "del_unsubscribe"]) & filters.user(ADMINS))
 async def manage_force_subscribe(client: Client, message: Message):
     await message.reply_text("Force Subscribe management feature is coming soon.")
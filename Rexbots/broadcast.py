@@ -4,17 +4,17 @@
 
 
 
-from pyrogram.errors import InputUserDeactivated, UserNotParticipant, FloodWait, UserIsBlocked, PeerIdInvalid
+from pyrogram.errors import InputUserDeactivated, UserNotParticipant, UserIsBlocked, PeerIdInvalid
 from database.db import db
 from pyrogram import Client, filters
 from config import ADMINS
-import asyncio
 import datetime
 import time
 from pyrogram.types import Message
 import json
 import os
 from logger import LOGGER
+from utils.ratelimit import limiter
 
 logger = LOGGER(__name__)
 
@@ -23,11 +23,9 @@ logger = LOGGER(__name__)
 # ---------------------------------------------------
 async def broadcast_messages(user_id, message):
     try:
-        await message.copy(chat_id=user_id)
+        # Paced per user and for the whole bot; FloodWaits slow the pace down and are retried
+        await limiter.call(message._client, "copy", user_id, lambda: message.copy(chat_id=user_id))
         return True, "Success"
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await broadcast_messages(user_id, message)
     except InputUserDeactivated:
         await db.delete_user(int(user_id))
         return False, "Deleted"
@@ -86,7 +84,7 @@ async def broadcast_command(bot: Client, message: Message):
 # Telegram Channel @RexBots_Official
 
             if done % 20 == 0:
-                await sts.edit(
+                text = (
                     f"**__Broadcast In Progress:__**\n\n"
                     f"**👥 Total Users:** {total_users}\n"
                     f"**💫 Completed:** {done} / {total_users}\n"
@@ -94,11 +92,13 @@ async def broadcast_command(bot: Client, message: Message):
                     f"**🚫 Blocked:** {blocked}\n"
                     f"**🚮 Deleted:** {deleted}"
                 )
+                # Paced like the copies, so status edits cannot flood the admin chat
+                await limiter.call(bot, "edit", sts.chat.id, lambda: sts.edit(text))
         else:
             done += 1
             failed += 1
             if done % 20 == 0:
-                await sts.edit(
+                text = (
                     f"**__Broadcast In Progress:__**\n\n"
                     f"**👥 Total Users:** {total_users}\n"
                     f"**💫 Completed:** {done} / {total_users}\n"
@@ -106,9 +106,10 @@ async def broadcast_command(bot: Client, message: Message):
                     f"**🚫 Blocked:** {blocked}\n"
                     f"**🚮 Deleted:** {deleted}"
                 )
+                await limiter.call(bot, "edit", sts.chat.id, lambda: sts.edit(text))
 
     time_taken = datetime.timedelta(seconds=int(time.time() - start_time))
-    await sts.edit(
+    text = (
         f"**__Broadcast Completed:__**\n"
         f"**⏰ Completed in:** {time_taken}\n\n"
         f"**👥 Total Users:** {total_users}\n"
@@ -117,6 +118,7 @@ async def broadcast_command(bot: Client, message: Message):
         f"**🚫 Blocked:** {blocked}\n"
         f"**🚮 Deleted:** {deleted}"
     )
+    await limiter.call(bot, "edit", sts.chat.id, lambda: sts.edit(text))
 
 # ---------------------------------------------------
 # /users Command (Standalone + JSON export)
@@ -10,8 +10,7 @@ async def set_caption(client: Client, message: Message):
     user_id = message.from_user.id
     
     # 1. Ensure User Exists
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     # 2. Validate Input
     if len(message.command) < 2:
@@ -46,8 +45,7 @@ async def see_caption(client: Client, message: Message):
     user_id = message.from_user.id
     
     # 1. Ensure User Exists
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     # 2. Fetch Caption
     caption = await db.get_caption(user_id)
@@ -75,8 +73,7 @@ async def del_caption(client: Client, message: Message):
     user_id = message.from_user.id
     
     # 1. Ensure User Exists
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     # 2. Check if caption exists
     caption = await db.get_caption(user_id)
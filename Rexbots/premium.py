@@ -1,3 +1,4 @@
+import time
 from pyrogram import Client, filters, enums
 from pyrogram.types import (
     Message,
@@ -6,6 +7,10 @@ from pyrogram.types import (
     InlineKeyboardButton
 )
 from database.db import db
+from utils.usage import usage
+from utils.entitlements import entitlements
+from Rexbots.admin import collect_user_ids, bulk_report
+from Rexbots.start import humanbytes
 from config import ADMINS
 from datetime import date, datetime, timedelta
 from logger import LOGGER
@@ -21,19 +26,20 @@ logger = LOGGER(__name__)
 async def my_plan(client: Client, message: Message):
     user_id = message.from_user.id
     
-    # 1. Ensure User Exists (Fixing the 'ensure_user' error manually)
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    # 1. Ensure User Exists
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     # 2. Fetch User Data Directly from DB
-    user_data = await db.col.find_one({'id': user_id})
+    user_data = await db.get_user(user_id)
     
     # Defaults
-    is_premium = user_data.get('is_premium', False)
+    is_premium = await entitlements.check(user_id)
     expiry = user_data.get('premium_expiry')
     daily_usage = user_data.get('daily_usage', 0)
-    # Note: total_saves needs to be tracked in your traffic logic to show up here
-    total_saves = user_data.get('total_saves', 0) 
+    # Lifetime totals: flushed counters plus the ones still waiting for the next flush
+    unflushed = usage.pending(user_id)
+    total_saves = user_data.get('total_saves', 0) + unflushed['saves']
+    total_bytes = user_data.get('total_bytes_up', 0) + unflushed['bytes_up']
 
     # 3. Generate Status Text
     if is_premium:
@@ -59,7 +65,8 @@ async def my_plan(client: Client, message: Message):
             f"<b>📅 Expiry:</b> {expiry_text}\n\n"
             f"<b>♾️ Daily Tokens:</b> Unlimited\n"
             f"<b>♾️ Batch Limit:</b> Unlimited\n"
-            f"<b>📊 Total Lifetime Saves:</b> <code>{total_saves}</code>\n\n"
+            f"<b>📊 Total Lifetime Saves:</b> <code>{total_saves}</code>\n"
+            f"<b>📦 Total Data Saved:</b> <code>{humanbytes(total_bytes)}</code>\n\n"
             "<i>Thank you for supporting the bot! 🎉</i>"
         )
     else:
@@ -71,7 +78,8 @@ async def my_plan(client: Client, message: Message):
             f"<b>👤 Plan: Free Tier</b>\n\n"
             f"<b>🎫 Daily Tokens:</b> <code>{tokens_left} / {daily_limit}</code>\n"
             f"<b>📦 File Size Limit:</b> <code>2 GB</code>\n"
-            f"<b>📊 Total Lifetime Saves:</b> <code>{total_saves}</code>\n\n"
+            f"<b>📊 Total Lifetime Saves:</b> <code>{total_saves}</code>\n"
+            f"<b>📦 Total Data Saved:</b> <code>{humanbytes(total_bytes)}</code>\n\n"
             "<i>Upgrade to Premium for unlimited access! 🚀</i>"
         )
 
@@ -157,8 +165,13 @@ async def add_premium_admin(client: Client, message: Message):
             expiry_date = (date.today() + timedelta(days=days)).isoformat()
             duration_text = f"{days} days (until {expiry_date})"
 
-        # Update DB
-        await db.add_premium(user_id, expiry_date)
+        # Update DB (the in-memory entitlement only for a stored user)
+        if not await db.add_premium(user_id, expiry_date):
+            return await message.reply_text(
+                f"❌ <b>Error:</b> No user with ID <code>{user_id}</code>. They must /start the bot first.",
+                parse_mode=enums.ParseMode.HTML
+            )
+        entitlements.grant(user_id, expiry_date)
 
         await message.reply_text(
             f"<b>✅ Premium Added Successfully</b>\n\n"
@@ -182,10 +195,54 @@ async def remove_premium_admin(client: Client, message: Message):
     try:
         user_id = int(message.command[1])
         await db.remove_premium(user_id)
+        entitlements.revoke(user_id)
         await message.reply_text(f"✅ Premium removed from <code>{user_id}</code>.")
     except Exception as e:
         await message.reply_text(f"Error: {e}")
 
+@Client.on_message(filters.command("bulk_premium") & filters.user(ADMINS) & filters.private)
+async def bulk_premium_admin(client: Client, message: Message):
+    if len(message.command) < 2 or not message.command[1].isdigit():
+        return await message.reply_text(
+            "<b>⚠️ Admin Usage:</b>\n"
+            "<code>/bulk_premium &lt;days&gt; &lt;id1&gt; &lt;id2&gt; ...</code>\n\n"
+            "<i>Or reply to a text/CSV file of ids. Use 0 days for permanent premium.</i>",
+            parse_mode=enums.ParseMode.HTML
+        )
+    days = int(message.command[1])
+    expiry_date = (date.today() + timedelta(days=days)).isoformat() if days else None
+    try:
+        ids = await collect_user_ids(client, message, skip=2)
+    except Exception as e:
+        return await message.reply_text(f"❌ <b>Error reading ids:</b> {e}", parse_mode=enums.ParseMode.HTML)
+    if not ids:
+        return await message.reply_text("❌ <b>Error:</b> No user ids found.", parse_mode=enums.ParseMode.HTML)
+
+    started = time.perf_counter()
+    result = await db.bulk_add_premium(ids, expiry_date)
+    # Ids without a user document matched nothing and get no entitlement either
+    for user_id in await db.existing_user_ids(ids):
+        entitlements.grant(user_id, expiry_date)
+    await message.reply_text(bulk_report(f"Premium Added ({f'until {expiry_date}' if expiry_date else 'Permanent'})", ids, result, started))
+
+@Client.on_message(filters.command("bulk_unpremium") & filters.user(ADMINS) & filters.private)
+async def bulk_unpremium_admin(client: Client, message: Message):
+    try:
+        ids = await collect_user_ids(client, message)
+    except Exception as e:
+        return await message.reply_text(f"❌ <b>Error reading ids:</b> {e}", parse_mode=enums.ParseMode.HTML)
+    if not ids:
+        return await message.reply_text(
+            "<b>⚠️ Usage:</b> <code>/bulk_unpremium &lt;id1&gt; &lt;id2&gt; ...</code> or reply to a text/CSV file of ids",
+            parse_mode=enums.ParseMode.HTML
+        )
+
+    started = time.perf_counter()
+    result = await db.bulk_remove_premium(ids)
+    for user_id in ids:
+        entitlements.revoke(user_id)
+    await message.reply_text(bulk_report("Premium Removed", ids, result, started))
+
 # ======================================================
 # CALLBACK QUERIES
 # ======================================================
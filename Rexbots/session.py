@@ -12,6 +12,7 @@ from pyrogram.errors import (
 from pyrogram import enums
 from config import API_ID, API_HASH
 from database.db import db
+from utils.pool import user_pool
 # ==========================================
 # STATE MANAGEMENT
 # Stores temporary login data
@@ -89,6 +90,8 @@ async def logout(client: Client, message: Message):
         del LOGIN_STATE[user_id]
     # Remove from Database
     await db.set_session(user_id, session=None)
+    # Close any pooled connection still using the old session
+    await user_pool.drop(user_id)
     await message.reply(
         "<b>🚪 Logout Successful! 👋</b>\n\n"
         "<i>Your session has been cleared. You can log in again anytime! 🔄</i>",
@@ -118,7 +121,8 @@ async def cancel_login(client: Client, message: Message):
             reply_markup=remove_keyboard
         )
     else:
-        pass
+        # Not logging in: let /cancel reach the job cancel handler in start.py
+        message.continue_propagation()
 # ---------------------------------------------------
 # FILTER: Check if user is in Login State
 # ---------------------------------------------------
@@ -1,8 +1,12 @@
 import os
+import datetime
 from pyrogram import Client, filters, enums
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from database.db import db
 from Rexbots.strings import COMMANDS_TXT
+from Rexbots.start import humanbytes
+from utils.usage import usage
+from utils.entitlements import entitlements
 # ======================================================
 # /settings - Enhanced Professional Settings Menu
 # ======================================================
@@ -10,10 +14,9 @@ from Rexbots.strings import COMMANDS_TXT
 async def settings_menu(client: Client, message: Message):
     user_id = message.from_user.id
     # Ensure user exists (Safe Call)
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
     # Fetch real status
-    is_premium = await db.check_premium(user_id)
+    is_premium = await entitlements.check(user_id)
     premium_badge = "💎 Premium Member" if is_premium else "👤 Free User"
     buttons = InlineKeyboardMarkup([
         [InlineKeyboardButton("📜 Commands List", callback_data="cmd_list_btn")],
@@ -53,8 +56,7 @@ async def direct_commands(client: Client, message: Message):
 @Client.on_message(filters.command("setchat") & filters.private)
 async def set_dump_chat(client: Client, message: Message):
     user_id = message.from_user.id
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
     if len(message.command) < 2:
         return await message.reply_text(
             "<b>🗑 Set Dump Chat</b>\n\n"
@@ -161,8 +163,8 @@ async def settings_callbacks(client: Client, callback_query: CallbackQuery):
         await callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(back_close), parse_mode=enums.ParseMode.HTML)
     elif data == "user_stats_btn":
         # Fetch real stats from DB
-        is_premium = await db.check_premium(user_id)
-        user_data = await db.col.find_one({'id': int(user_id)})
+        is_premium = await entitlements.check(user_id)
+        user_data = await db.get_user(user_id)
        
         if is_premium:
             limit_text = "♾️ Unlimited"
@@ -173,17 +175,30 @@ async def settings_callbacks(client: Client, callback_query: CallbackQuery):
             used = user_data.get('daily_usage', 0)
             limit_text = f"{daily_limit} Files / 24h"
             usage_text = f"{used} / {daily_limit}"
+        # Analytics: flushed counters plus the ones still waiting for the next flush
+        day = datetime.date.today().isoformat()
+        today = await db.get_daily_usage(user_id, day)
+        today_pending = usage.pending(user_id, day)
+        lifetime_pending = usage.pending(user_id)
+        today_saves = today.get('saves', 0) + today_pending['saves']
+        today_bytes = today.get('bytes_up', 0) + today_pending['bytes_up']
+        total_saves = user_data.get('total_saves', 0) + lifetime_pending['saves']
+        total_bytes = user_data.get('total_bytes_up', 0) + lifetime_pending['bytes_up']
+        failures = user_data.get('total_failures', 0) + lifetime_pending['failures']
         text = (
             f"<b>📊 My Usage Statistics</b>\n\n"
             f"<b>Plan:</b> {'💎 Premium' if is_premium else '👤 Free'}\n"
             f"<b>Daily Limit:</b> <code>{limit_text}</code>\n"
             f"<b>Today's Usage:</b> <code>{usage_text}</code>\n\n"
+            f"<b>Saved Today:</b> <code>{today_saves} files ({humanbytes(today_bytes)})</code>\n"
+            f"<b>Lifetime:</b> <code>{total_saves} files ({humanbytes(total_bytes)})</code>\n"
+            f"<b>Failed Transfers:</b> <code>{failures}</code>\n\n"
             f"<i>Upgrade to Premium for unlimited downloads!</i>"
         )
         await callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(back_close), parse_mode=enums.ParseMode.HTML)
     elif data == "settings_back_btn":
         # Re-render main menu
-        is_premium = await db.check_premium(user_id)
+        is_premium = await entitlements.check(user_id)
         premium_badge = "💎 Premium Member" if is_premium else "👤 Free User"
        
         buttons = InlineKeyboardMarkup([
@@ -11,8 +11,27 @@ from pyrogram.errors import (
     InviteHashExpired, UsernameNotOccupied, AuthKeyUnregistered, UserDeactivated, UserDeactivatedBan
 )
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery, InputMediaPhoto
-from config import API_ID, API_HASH, ERROR_MESSAGE
+from config import (
+    ERROR_MESSAGE, FREE_DOWNLOAD_WORKERS, PREMIUM_DOWNLOAD_WORKERS,
+    PIPELINE_FETCH_DEPTH, PIPELINE_UPLOAD_DEPTH, STREAM_RELAY
+)
 from database.db import db
+from utils.pool import user_pool
+from utils.prefetch import iter_messages
+from utils.pipeline import run_pipeline
+from utils.media import get_media, media_file_name, send_uploaded_media
+from utils.file_cache import file_cache, cache_key, source_key
+from utils.singleflight import transfers
+from utils.media_cache import media_cache
+from utils.progress import progress_bus
+from utils.relay import can_relay, relay_media
+from utils.download import downloader, DownloadError
+from utils.upload import uploader
+from utils.scheduler import scheduler
+from utils.usage import usage
+from utils.entitlements import entitlements
+from utils.jobs import job_store
+from utils.ratelimit import limiter
 import math
 from logger import LOGGER
 
@@ -204,78 +223,32 @@ def get_message_type(msg):
 # 📊 PROGRESS BAR ENGINE (Upgraded to Professional)
 # ==============================================================================
 
-async def downstatus(client, statusfile, message, chat):
-    while not os.path.exists(statusfile):
-        await asyncio.sleep(3)
-    while os.path.exists(statusfile):
-        try:
-            with open(statusfile, "r", encoding='utf-8') as downread:
-                txt = downread.read()
-            await client.edit_message_text(chat, message.id, f"{txt}")
-            await asyncio.sleep(5)
-        except:
-            await asyncio.sleep(5)
-
-async def upstatus(client, statusfile, message, chat):
-    while not os.path.exists(statusfile):
-        await asyncio.sleep(3)
-    while os.path.exists(statusfile):
-        try:
-            with open(statusfile, "r", encoding='utf-8') as upread:
-                txt = upread.read()
-            await client.edit_message_text(chat, message.id, f"{txt}")
-            await asyncio.sleep(5)
-        except:
-            await asyncio.sleep(5)
-
-def progress(current, total, message, type):
-    # Check Cancel
-    if batch_temp.IS_BATCH.get(message.from_user.id):
-        raise Exception("Cancelled")
-
-    if not hasattr(progress, "cache"):
-        progress.cache = {}
-    
+def render_progress(entry):
+    """Formats a progress bus entry into the status message text."""
     now = time.time()
-    task_id = f"{message.id}{type}"
-    last_time = progress.cache.get(task_id, 0)
-    
-    if not hasattr(progress, "start_time"):
-        progress.start_time = {}
-    if task_id not in progress.start_time:
-        progress.start_time[task_id] = now
-        
-    if (now - last_time) > 5 or current == total:
-        try:
-            percentage = current * 100 / total
-            speed = current / (now - progress.start_time[task_id]) if (now - progress.start_time[task_id]) > 0 else 0
-            eta = (total - current) / speed if speed > 0 else 0
-            elapsed = now - progress.start_time[task_id]
-            
-            # Upgraded Bar: Longer (20 segments) for smoother, professional visualization
-            filled_length = int(percentage / 5)  # 20 segments total
-            bar = '█' * filled_length + ' ' * (20 - filled_length)  # Using █ for solid fill, space for empty (better contrast)
-            
-            status = script.PROGRESS_BAR.format(
-                bar=bar,
-                percentage=percentage,
-                current=humanbytes(current),
-                total=humanbytes(total),
-                speed=humanbytes(speed),
-                elapsed=TimeFormatter(elapsed * 1000),
-                eta=TimeFormatter(eta * 1000)
-            )
-            
-            with open(f'{message.id}{type}status.txt', "w", encoding='utf-8') as fileup:
-                fileup.write(status)
-                
-            progress.cache[task_id] = now
-            
-            if current == total:
-                progress.start_time.pop(task_id, None)
-                progress.cache.pop(task_id, None)
-        except:
-            pass
+    elapsed = now - entry.started
+    percentage = entry.current * 100 / entry.total if entry.total else 0
+    speed = entry.current / elapsed if elapsed > 0 else 0
+    eta = (entry.total - entry.current) / speed if speed > 0 else 0
+
+    # Upgraded Bar: Longer (20 segments) for smoother, professional visualization
+    filled_length = int(percentage / 5)  # 20 segments total
+    bar = '█' * filled_length + ' ' * (20 - filled_length)  # Using █ for solid fill, space for empty (better contrast)
+
+    return script.PROGRESS_BAR.format(
+        bar=bar,
+        percentage=percentage,
+        current=humanbytes(entry.current),
+        total=humanbytes(entry.total),
+        speed=humanbytes(speed),
+        elapsed=TimeFormatter(elapsed * 1000),
+        eta=TimeFormatter(eta * 1000)
+    )
+
+def progress(current, total, message, key):
+    # Only counters here: rendering and editing happen in the bus renderer.
+    # /cancel cancels the job task itself, so nothing is raised from here.
+    progress_bus.update(key, current, total)
 
 # ==============================================================================
 # 🎮 CORE COMMANDS
@@ -283,8 +256,7 @@ def progress(current, total, message, type):
 
 @Client.on_message(filters.command(["start"]))
 async def send_start(client: Client, message: Message):
-    if not await db.is_user_exist(message.from_user.id):
-        await db.add_user(message.from_user.id, message.from_user.first_name)
+    await db.ensure_user(message.from_user.id, message.from_user.first_name)
 
     # Auto-Reaction
     try:
@@ -356,6 +328,11 @@ async def send_plan(client: Client, message: Message):
 @Client.on_message(filters.command(["cancel"]))
 async def send_cancel(client: Client, message: Message):
     batch_temp.IS_BATCH[message.from_user.id] = True
+    # Cancels the running job where it stands and drops the queued ones (stored copies too)
+    running, dropped = scheduler.cancel(message.from_user.id)
+    stored = await job_store.drop_users([message.from_user.id])
+    if not running and not dropped and not stored:
+        return await message.reply_text("ℹ️ No Active Task To Cancel.")
     await message.reply_text("❌ Batch Process Cancelled Successfully.")
 
 # ==============================================================================
@@ -367,7 +344,7 @@ async def settings_panel(client, callback_query):
     Renders the Settings Menu with professional layout.
     """
     user_id = callback_query.from_user.id
-    is_premium = await db.check_premium(user_id)
+    is_premium = await entitlements.check(user_id)
     badge = "💎 Premium Member" if is_premium else "👤 Standard User"
     
     # Updated button layout: Single-column for settings to match new streamlined design
@@ -392,27 +369,27 @@ async def settings_panel(client, callback_query):
 # 🚀 MAIN DOWNLOAD LOGIC (Public & Private)
 # ==============================================================================
 
+async def send_limit_reached(client: Client, message: Message):
+    btn = InlineKeyboardMarkup([[InlineKeyboardButton("💎 Upgrade to Premium", callback_data="buy_premium")]])
+    await limiter.call(client, "send", message.chat.id, lambda: message.reply_photo(
+        photo=SUBSCRIPTION,
+        caption=script.LIMIT_REACHED,
+        reply_markup=btn,
+        parse_mode=enums.ParseMode.HTML
+    ))
+
 @Client.on_message(filters.text & filters.private & ~filters.regex("^/"))
 async def save(client: Client, message: Message):
     if "https://t.me/" in message.text:
         
         # --- 1. GLOBAL LIMIT CHECK ---
         # We check limit first for everyone (Public or Private)
-        is_limit_reached = await db.check_limit(message.from_user.id)
+        profile = await db.get_profile(message.from_user.id) or {}
+        is_limit_reached = await db.check_limit(message.from_user.id, user=profile, limit=FREE_LIMIT_DAILY)
         if is_limit_reached:
-            btn = InlineKeyboardMarkup([[InlineKeyboardButton("💎 Upgrade to Premium", callback_data="buy_premium")]])
-            return await message.reply_photo(
-                photo=SUBSCRIPTION,
-                caption=script.LIMIT_REACHED,
-                reply_markup=btn,
-                parse_mode=enums.ParseMode.HTML
-            )
+            return await send_limit_reached(client, message)
         
-        # --- 2. BATCH CONTROL ---
-        if batch_temp.IS_BATCH.get(message.from_user.id) == False:
-            return await message.reply_text("<b>⚠️ A Task is Currently Processing.</b>\n<i>Please wait for completion or use /cancel to stop.</i>", parse_mode=enums.ParseMode.HTML)
-
-        # --- 3. LINK PARSING ---
+        # --- 2. LINK PARSING ---
         datas = message.text.split("/")
         temp = datas[-1].replace("?single", "").split("-")
         fromID = int(temp[0].strip())
@@ -421,170 +398,444 @@ async def save(client: Client, message: Message):
         except:
             toID = fromID
 
-        batch_temp.IS_BATCH[message.from_user.id] = False
-
-        # Determine Link Type
-        is_private_link = "https://t.me/c/" in message.text
-        is_batch = "https://t.me/b/" in message.text
-        is_public_link = not is_private_link and not is_batch
-
-        # --- 4. PROCESSING LOOP ---
-        for msgid in range(fromID, toID + 1):
-            
-            # Check Cancel Flag
-            if batch_temp.IS_BATCH.get(message.from_user.id):
-                break
-            
-            # ==================================================================
-            # 🟢 PATH A: PUBLIC LINK HANDLING (No Login Required)
-            # ==================================================================
-            if is_public_link:
-                username = datas[3]
+        # --- 3. QUEUE ---
+        # Range links are stored first, so a restart resumes them instead of losing them
+        job_id = None
+        if toID > fromID:
+            try:
+                job_id = await job_store.create(message, fromID, toID)
+            except Exception as e:
+                logger.error(f"Could not store batch job: {e}")
+        position = await queue_link(client, message, datas, fromID, toID, job_id)
+        if position:
+            await message.reply_text(
+                f"<b>⏳ Task Queued</b>\n\n<b>Position:</b> <code>{position}</code>\n"
+                "<i>It starts automatically when a slot is free. Use /cancel to drop it.</i>",
+                parse_mode=enums.ParseMode.HTML
+            )
+
+async def queue_link(client: Client, message: Message, datas, fromID, toID, job_id=None):
+    """
+    Hands a parsed link to the global scheduler: one job at a time per user, premium first.
+    Returns the queue position (0 if it started right away).
+    """
+    return scheduler.submit(
+        message.from_user.id,
+        lambda: process_link(client, message, datas, fromID, toID, job_id),
+        premium=await entitlements.check(message.from_user.id)
+    )
+
+async def resume_jobs(client: Client):
+    """Requeues the range jobs a restart interrupted, each from the message after its checkpoint."""
+    for doc in await db.get_jobs():
+        from_id = doc['from_id'] if doc.get('last_done') is None else doc['last_done'] + 1
+        message = None
+        if doc['user_id'] not in db.banned_ids and from_id <= doc['to_id']:
+            try:
+                message = await limiter.call(client, "get", doc['chat_id'], lambda: client.get_messages(doc['chat_id'], doc['message_id']))
+            except Exception as e:
+                logger.warning(f"Could not load the link of job {doc['_id']}: {e}")
+        if not message or message.empty or not message.text or not message.from_user:
+            await db.delete_job(doc['_id'])
+            continue
+        await queue_link(client, message, message.text.split("/"), from_id, doc['to_id'], doc['_id'])
+        job_store.resumed += 1
+        try:
+            await limiter.call(client, "send", message.chat.id, lambda: message.reply_text(
+                f"<b>♻️ Batch Resumed</b>\n\n<i>The bot restarted, your batch continues from message</i> <code>{from_id}</code>.",
+                parse_mode=enums.ParseMode.HTML
+            ))
+        except Exception:
+            pass
+    if job_store.resumed:
+        logger.info(f"Resumed {job_store.resumed} batch jobs")
+
+async def process_link(client: Client, message: Message, datas, fromID, toID, job_id=None):
+    """Runs one queued link job (single post or range) for the user; `job_id` is its stored copy."""
+    batch_temp.IS_BATCH[message.from_user.id] = False
+    job_store.start(job_id, message.from_user.id, fromID, toID)
+
+    # Determine Link Type
+    is_private_link = "https://t.me/c/" in message.text
+    is_batch = "https://t.me/b/" in message.text
+    is_public_link = not is_private_link and not is_batch
+
+    if is_private_link:
+        chat_target = int("-100" + datas[4])
+    elif is_batch:
+        chat_target = datas[4]
+    else:
+        chat_target = datas[3]
+
+    # --- 4. PROCESSING LOOP ---
+    # The user session is connected once per batch (lazily, public
+    # copies don't need it) and shared through the pool with the user's other jobs.
+    acc = None
+    msgid = fromID
+    try:
+        # One profile fetch per job: session, plan, quota, thumbnail and caption all come
+        # from this snapshot (loaded at start, after any earlier job of the user finished).
+        profile = await db.get_profile(message.from_user.id) or {}
+        job = {
+            "profile": profile,
+            "is_premium": await entitlements.check(message.from_user.id),
+            "thumb": profile.get('thumbnail')
+        }
+
+        # ==================================================================
+        # 🟢 PATH A: PUBLIC LINK HANDLING (No Login Required)
+        # ==================================================================
+        if is_public_link:
+            while msgid <= toID:
+                # Check Cancel Flag
+                if batch_temp.IS_BATCH.get(message.from_user.id):
+                    break
+                # Count the save up front: quota check and increment are one atomic step.
+                # A copy that does not go through gives it back.
+                if not job["is_premium"]:
+                    allowed, _ = await db.consume_quota(message.from_user.id, FREE_LIMIT_DAILY)
+                    if not allowed:
+                        return await send_limit_reached(client, message)
+                delivered = False
                 try:
                     # Attempt to Copy directly using Bot API
-                    # This is fast and requires NO login session
-                    await client.copy_message(
+                    # This is fast and requires NO login session (paced by the shared rate limiter)
+                    await limiter.call(client, "copy", message.chat.id, lambda: client.copy_message(
                         chat_id=message.chat.id, 
-                        from_chat_id=username, 
+                        from_chat_id=chat_target, 
                         message_id=msgid, 
                         reply_to_message_id=message.id
-                    )
-                    # Success! Count traffic and continue
-                    await db.add_traffic(message.from_user.id)
-                    await asyncio.sleep(1)
-                    continue 
-                except Exception as e:
+                    ))
+                    delivered = True
+                    usage.record(message.from_user.id, saves=1)
+                    job_store.checkpoint(job_id, msgid)
+                    msgid += 1
+                except Exception:
                     # If this fails, it might be a Restricted Content channel or Bot is banned
-                    # Fallback to Login Logic below
-                    pass 
-
-            # ==================================================================
-            # 🟠 PATH B: PRIVATE / RESTRICTED HANDLING (Login Required)
-            # ==================================================================
-            
-            # 1. Check Session
-            user_data = await db.get_session(message.from_user.id)
-            if user_data is None:
-                await message.reply(
-                    "<b>🔒 Authentication Required</b>\n\n"
-                    "<i>Access to this content requires login.</i>\n"
-                    "<i>Use /login to securely authorize your account.</i>", 
-                    parse_mode=enums.ParseMode.HTML
-                )
-                batch_temp.IS_BATCH[message.from_user.id] = True
-                return
-
-            # 2. Connect User Client
-            try:
-                # 🚀 SPEED UPGRADE ENABLED
-                acc = Client(
-                    "saverestricted", 
-                    session_string=user_data, 
-                    api_hash=API_HASH, 
-                    api_id=API_ID, 
-                    in_memory=True,
-                    max_concurrent_transmissions=10 # High speed
-                )
-                await acc.connect()
-            except Exception as e:
-                batch_temp.IS_BATCH[message.from_user.id] = True
-                return await message.reply(f"<b>❌ Authentication Failed</b>\n\n<i>Your session may have expired. Please /logout and /login again.</i>\n<code>{e}</code>", parse_mode=enums.ParseMode.HTML)
-
-            # 3. Route to Handler
-            if is_private_link:
-                chatid = int("-100" + datas[4])
-                await handle_restricted_content(client, acc, message, chatid, msgid)
-            elif is_batch:
-                username = datas[4]
-                await handle_restricted_content(client, acc, message, username, msgid)
-            else:
-                # Fallback for failed public links (Restricted Public)
-                username = datas[3]
-                await handle_restricted_content(client, acc, message, username, msgid)
-
-            await asyncio.sleep(2) # Prevent floodwait
+                    # Fallback to Login Logic below for the rest of the range
+                    break
+                finally:
+                    if not delivered and not job["is_premium"]:
+                        await db.refund_quota(message.from_user.id)
+
+        # ==================================================================
+        # 🟠 PATH B: PRIVATE / RESTRICTED HANDLING (Login Required)
+        # ==================================================================
+        if msgid > toID or batch_temp.IS_BATCH.get(message.from_user.id):
+            return
 
+        # 1. Check Session
+        user_data = profile.get('session')
+        if user_data is None:
+            await limiter.call(client, "send", message.chat.id, lambda: message.reply(
+                "<b>🔒 Authentication Required</b>\n\n"
+                "<i>Access to this content requires login.</i>\n"
+                "<i>Use /login to securely authorize your account.</i>", 
+                parse_mode=enums.ParseMode.HTML
+            ))
+            return
+
+        # 2. Connect User Client (pooled, reused across the batch)
+        try:
+            acc = await user_pool.acquire(message.from_user.id, user_data)
+        except Exception as e:
+            text = f"<b>❌ Authentication Failed</b>\n\n<i>Your session may have expired. Please /logout and /login again.</i>\n<code>{e}</code>"
+            return await limiter.call(client, "send", message.chat.id, lambda: message.reply(text, parse_mode=enums.ParseMode.HTML))
+
+        # 3. Staged pipeline: fetch (chunked) -> download -> upload
+        # Message N+1 downloads while message N uploads; premium users get more download workers.
+        # Uploads run in message order, so each delivered one checkpoints the batch up to its message.
+        async def download_one(msg):
+            return msg.id, await download_stage(client, acc, message, msg, job)
+
+        async def upload_one(result):
+            msg_id, item = result
+            if await upload_stage(client, acc, message, item, job):
+                job_store.checkpoint(job_id, msg_id)
+
+        await run_pipeline(
+            iter_messages(acc, chat_target, msgid, toID),
+            download_one,
+            upload_one,
+            workers=PREMIUM_DOWNLOAD_WORKERS if job["is_premium"] else FREE_DOWNLOAD_WORKERS,
+            fetch_depth=PIPELINE_FETCH_DEPTH,
+            upload_depth=PIPELINE_UPLOAD_DEPTH,
+            should_stop=lambda: batch_temp.IS_BATCH.get(message.from_user.id),
+            discard=lambda result: discard_item(client, result[1])
+        )
+    finally:
+        if acc is not None:
+            user_pool.release(message.from_user.id)
+        if os.path.exists(f"downloads/{message.chat.id}/{message.id}"): shutil.rmtree(f"downloads/{message.chat.id}/{message.id}", ignore_errors=True)
         batch_temp.IS_BATCH[message.from_user.id] = True
+        await job_store.finish(job_id)
 
 # ==============================================================================
 # 📥 RESTRICTED CONTENT DOWNLOADER
 # ==============================================================================
 
-async def handle_restricted_content(client: Client, acc, message: Message, chat_target, msgid):
+async def fetch_to_disk(client: Client, acc, message: Message, item):
+    """Downloads the item's media into its temp directory and returns the file path."""
+    temp_dir = item["temp_dir"]
+    key = f'{message.chat.id}:{message.id}:{item["msg"].id}:down'
+    try:
+        progress_bus.watch(key, item["smsg"], render_progress)
+        path = None
+        # Large media: several connections at once, resumable from the parts already on disk.
+        # A dropped download is resumed once; a single connection is the last fallback.
+        if downloader.can_download(item["type"], item["size"]):
+            for attempt in (1, 2):
+                try:
+                    path = await downloader.to_file(
+                        acc, item["msg"], item["type"],
+                        os.path.join(temp_dir, media_file_name(item["msg"], item["type"])),
+                        item["size"],
+                        progress=progress,
+                        progress_args=[message, key]
+                    )
+                    break
+                except Exception as e:
+                    logger.warning(f"Parallel download failed (attempt {attempt}): {e}")
+                    if isinstance(e, DownloadError):
+                        break
+        if path is None:
+            path = await acc.download_media(
+                item["msg"], 
+                file_name=f"{temp_dir}/", 
+                progress=progress, 
+                progress_args=[message, key]
+            )
+        if path:
+            usage.record(message.from_user.id, bytes_down=os.path.getsize(path))
+        return path
+    finally:
+        progress_bus.stop(key)
+
+async def relay_to_bot(client: Client, acc, message: Message, item):
+    """Streams the item's media from the user session into a bot upload. Returns the InputFile, None if the stream broke."""
+    key = f'{message.chat.id}:{message.id}:{item["msg"].id}:down'
     try:
-        msg: Message = await acc.get_messages(chat_target, msgid)
+        progress_bus.watch(key, item["smsg"], render_progress)
+        input_file = await relay_media(
+            acc, client, item["msg"], item["size"],
+            media_file_name(item["msg"], item["type"]),
+            progress=progress,
+            progress_args=[message, key]
+        )
+        usage.record(message.from_user.id, bytes_down=item["size"])
+        return input_file
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching message: {e}")
-        return
+        logger.warning(f"Streaming relay failed, falling back to disk: {e}")
+        return None
+    finally:
+        progress_bus.stop(key)
 
-    if msg.empty:
-        return
-    
+async def start_transfer(client: Client, acc, message: Message, item):
+    """
+    Opens the status message and temp directory for an item and downloads it, to
+    disk or straight into a bot upload through the streaming relay. Returns None
+    if the download failed.
+    """
+    msg = item["msg"]
+    smsg = await limiter.call(client, "send", message.chat.id, lambda: client.send_message(message.chat.id, '<b>⬇️ Starting Download...</b>', reply_to_message_id=message.id, parse_mode=enums.ParseMode.HTML))
+    item["smsg"] = smsg
+
+    # Unique temp directory per item (several items of a batch download at once)
+    temp_dir = f"downloads/{message.chat.id}/{message.id}/{msg.id}"
+    item["temp_dir"] = temp_dir
+    if not os.path.exists(temp_dir): os.makedirs(temp_dir)
+
+    # Already shared by another job's download
+    if item.get("file"):
+        return item
+
+    # Local media cache: an earlier download of the same file is still on disk
+    cached_path = media_cache.acquire(item["uid"])
+    if cached_path:
+        item["file"] = cached_path
+        item["lease"] = item["uid"]
+        return item
+
+    # Concurrent requests for this post from other users join this download
+    flight = transfers.lead(item["source"], item["key"])
+    try:
+        # Big media is streamed from the user session straight into big-file parts of
+        # the bot, so only the send is left for the upload stage and no disk space is
+        # needed. A broken stream falls back to the (resumable) download to disk.
+        if STREAM_RELAY and can_relay(item["type"], item["size"]):
+            item["input_file"] = await relay_to_bot(client, acc, message, item)
+        if item.get("input_file") is None:
+            item["file"] = await fetch_to_disk(client, acc, message, item)
+            cached_path = media_cache.store(item["uid"], item["file"])
+            if cached_path:
+                item["file"] = cached_path
+                item["lease"] = item["uid"]
+    except asyncio.CancelledError:
+        await discard_item(client, item)
+        raise
+    except Exception:
+        usage.record(message.from_user.id, failures=1)
+        if os.path.exists(temp_dir): shutil.rmtree(temp_dir)
+        await limiter.call(client, "edit", message.chat.id, smsg.delete)
+        return None
+    finally:
+        if flight and item.get("input_file"):
+            # Followers get the file_id once the upload stage has sent it
+            item["lead"] = flight
+        elif flight:
+            transfers.finish(flight, path=item.get("file"))
+
+    return item
+
+async def download_stage(client: Client, acc, message: Message, msg: Message, job):
+    """
+    First half of a restricted save: checks, counts and downloads one message.
+    Returns the item dict handed to upload_stage, or None if there is nothing to send.
+    """
     msg_type = get_message_type(msg)
     if not msg_type:
-        return
+        return None
 
     # --- SIZE LIMIT CHECK ---
     file_size = 0
     if msg_type == "Document": file_size = msg.document.file_size
     elif msg_type == "Video": file_size = msg.video.file_size
     elif msg_type == "Audio": file_size = msg.audio.file_size
-    
-    # 2GB Limit for Free Users
-    if file_size > FREE_LIMIT_SIZE:
-        if not await db.check_premium(message.from_user.id):
-            btn = InlineKeyboardMarkup([[InlineKeyboardButton("💎 Upgrade to Premium", callback_data="buy_premium")]])
-            await client.send_message(
-                message.chat.id, 
-                script.SIZE_LIMIT,
-                reply_markup=btn,
-                parse_mode=enums.ParseMode.HTML
-            )
-            return
 
-    # --- TEXT HANDLING ---
+    item = {"msg": msg, "type": msg_type, "size": file_size}
+
+    # --- TEXT HANDLING (sent by the upload stage to keep order) ---
     if msg_type == "Text":
-        try:
-            await client.send_message(message.chat.id, msg.text, entities=msg.entities, parse_mode=enums.ParseMode.HTML)
-            return
-        except:
-            return
+        return item
 
-    # --- INCREMENT COUNTER ---
-    await db.add_traffic(message.from_user.id)
+    # 2GB Limit for Free Users
+    if file_size > FREE_LIMIT_SIZE and not job["is_premium"]:
+        item["blocked"] = True
+        return item
+
+    # --- DAILY QUOTA ---
+    # One atomic check-and-count per file, so parallel downloads cannot overrun the limit
+    if not job["is_premium"]:
+        allowed, _ = await db.consume_quota(message.from_user.id, FREE_LIMIT_DAILY)
+        if not allowed:
+            # Ends the batch; only the first blocked item tells the user
+            batch_temp.IS_BATCH[message.from_user.id] = True
+            if job.get("limit_hit"):
+                return None
+            job["limit_hit"] = True
+            item["limit"] = True
+            return item
+
+    # --- FILE ID CACHE ---
+    # A post the bot already uploaded is re-sent by file_id, no transfer at all
+    item["uid"] = get_media(msg, msg_type).file_unique_id
+    item["source"] = source_key(msg, get_media(msg, msg_type))
+    item["key"] = cache_key(msg, get_media(msg, msg_type), job["thumb"])
+    item["cached"] = await file_cache.get(item["key"])
+    if item["cached"]:
+        return item
+
+    # --- SINGLE-FLIGHT ---
+    # Another user's job is moving this exact post right now: wait for it instead
+    item["flight"] = transfers.follow(item["source"], f"downloads/{message.chat.id}/{message.id}/{msg.id}", item["key"])
+    if item["flight"]:
+        return item
 
     # --- DOWNLOAD PROCESS ---
-    smsg = await client.send_message(message.chat.id, '<b>⬇️ Starting Download...</b>', reply_to_message_id=message.id, parse_mode=enums.ParseMode.HTML)
-    
-    # Create unique temp directory
-    temp_dir = f"downloads/{message.id}"
-    if not os.path.exists(temp_dir): os.makedirs(temp_dir)
-
+    return await start_transfer(client, acc, message, item)
+
+def build_caption(job, msg: Message, file_name, file_size):
+    custom_caption = job["profile"].get('caption')
+    if custom_caption:
+        return custom_caption.format(filename=file_name, size=humanbytes(file_size))
+    final_caption = script.CAPTION.format(file_name=file_name)
+    if msg.caption:
+        final_caption += f"\n\n{msg.caption}"
+    return final_caption
+
+async def send_cached(client: Client, message: Message, item, job):
+    """Re-sends a cached upload with the user's caption. False if the file_id is no longer valid."""
+    entry = item["cached"]
+    caption = build_caption(job, item["msg"], entry["file_name"], item["size"])
     try:
-        asyncio.create_task(downstatus(client, f'{message.id}downstatus.txt', smsg, message.chat.id))
-        
-        file = await acc.download_media(
-            msg, 
-            file_name=f"{temp_dir}/", 
-            progress=progress, 
-            progress_args=[message, "down"]
-        )
-        
-        if os.path.exists(f'{message.id}downstatus.txt'): os.remove(f'{message.id}downstatus.txt')
-
+        await limiter.call(client, "send", message.chat.id, lambda: client.send_cached_media(message.chat.id, entry["file_id"], caption=caption))
+        usage.record(message.from_user.id, saves=1)
+        return True
     except Exception as e:
-        if batch_temp.IS_BATCH.get(message.from_user.id) or "Cancelled" in str(e):
-            if os.path.exists(temp_dir): shutil.rmtree(temp_dir)
-            return await smsg.edit("❌ **Task Cancelled**")
-        return await smsg.delete()
+        logger.warning(f"Cached file_id rejected, transferring again: {e}")
+        return False
+
+async def upload_stage(client: Client, acc, message: Message, item, job):
+    """
+    Second half of a restricted save: sends a downloaded (or relayed) item to the user.
+    Returns True once the item is delivered or there was nothing to send.
+    """
+    if item is None:
+        return True
+
+    msg = item["msg"]
+    msg_type = item["type"]
+    file_size = item["size"]
+
+    if msg_type == "Text":
+        try:
+            await limiter.call(client, "send", message.chat.id, lambda: client.send_message(message.chat.id, msg.text, entities=msg.entities, parse_mode=enums.ParseMode.HTML))
+        except Exception:
+            return False
+        return True
+
+    if item.get("limit"):
+        await send_limit_reached(client, message)
+        return False
+
+    if item.get("blocked"):
+        btn = InlineKeyboardMarkup([[InlineKeyboardButton("💎 Upgrade to Premium", callback_data="buy_premium")]])
+        await limiter.call(client, "send", message.chat.id, lambda: client.send_message(
+            message.chat.id, 
+            script.SIZE_LIMIT,
+            reply_markup=btn,
+            parse_mode=enums.ParseMode.HTML
+        ))
+        return True
+
+    if item.get("flight"):
+        shared = await item.pop("flight")
+        if shared and "file_id" in shared:
+            item["cached"] = shared
+            item["shared"] = True
+        elif shared:
+            item["file"] = shared["path"]
+            transfers.saved(file_size)
+
+    if "smsg" not in item:
+        # Cached or coalesced upload: a file_id re-send is all that's needed
+        if item.get("cached") and await send_cached(client, message, item, job):
+            if item.get("shared"):
+                transfers.saved(file_size * 2)
+            return True
+        if item.get("cached") and not item.get("shared"):
+            await file_cache.invalidate(item["key"])
+        item["cached"] = None
+        if not await start_transfer(client, acc, message, item):
+            return False
+
+    smsg = item["smsg"]
+    temp_dir = item["temp_dir"]
+    file = item.get("file")
+    file_name = file.split("/")[-1] if file else media_file_name(msg, msg_type)
 
     # --- UPLOAD PROCESS ---
+    key = f"{message.chat.id}:{message.id}:{msg.id}:up"
+    flight = item.pop("lead", None)
+    sent = entry = None
     try:
-        asyncio.create_task(upstatus(client, f'{message.id}upstatus.txt', smsg, message.chat.id))
+        progress_bus.watch(key, smsg, render_progress)
         
         # 1. Custom Thumbnail (Priority)
         ph_path = None
-        thumb_id = await db.get_thumbnail(message.from_user.id)
+        thumb_id = job["thumb"]
         
         if thumb_id:
             try:
@@ -601,35 +852,84 @@ async def handle_restricted_content(client: Client, acc, message: Message, chat_
                     ph_path = await acc.download_media(msg.video.thumbs[0].file_id, file_name=f"{temp_dir}/thumb.jpg")
                 elif msg_type == "Document" and msg.document.thumbs:
                     ph_path = await acc.download_media(msg.document.thumbs[0].file_id, file_name=f"{temp_dir}/thumb.jpg")
-            except:
+            except Exception:
                 pass
 
         # Custom Caption
-        custom_caption = await db.get_caption(message.from_user.id)
-        if custom_caption:
-            final_caption = custom_caption.format(filename=file.split("/")[-1], size=humanbytes(file_size))
-        else:
-            final_caption = script.CAPTION.format(file_name=file.split("/")[-1])
-            if msg.caption:
-                final_caption += f"\n\n{msg.caption}"
+        final_caption = build_caption(job, msg, file_name, file_size)
+
+        # Relayed in the download stage: the parts are uploaded already, only the send is left
+        if item.get("input_file"):
+            input_file = item.pop("input_file")
+            try:
+                sent = await limiter.call(client, "send", message.chat.id, lambda: send_uploaded_media(client, message.chat.id, msg, msg_type, input_file, file_name, caption=final_caption, thumb=ph_path))
+            except Exception as e:
+                logger.warning(f"Sending the relayed file failed, falling back to disk: {e}")
+                file = await fetch_to_disk(client, acc, message, item)
+
+        # Large files: parts saved in parallel, the regular send below is the fallback
+        if file is not None and uploader.can_upload(msg_type, os.path.getsize(file)):
+            try:
+                input_file = await uploader.upload(client, file, file_name, progress=progress, progress_args=[message, key])
+                sent = await limiter.call(client, "send", message.chat.id, lambda: send_uploaded_media(client, message.chat.id, msg, msg_type, input_file, file_name, caption=final_caption, thumb=ph_path))
+            except Exception as e:
+                logger.warning(f"Parallel upload failed, falling back to a regular send: {e}")
 
         # Send File
-        if msg_type == "Document":
-            await client.send_document(message.chat.id, file, thumb=ph_path, caption=final_caption, progress=progress, progress_args=[message, "up"])
+        if file is None or sent:
+            pass # Already sent by the relay or the parallel upload
+        elif msg_type == "Document":
+            sent = await limiter.call(client, "send", message.chat.id, lambda: client.send_document(message.chat.id, file, thumb=ph_path, caption=final_caption, progress=progress, progress_args=[message, key]))
         elif msg_type == "Video":
-            await client.send_video(message.chat.id, file, duration=msg.video.duration, width=msg.video.width, height=msg.video.height, thumb=ph_path, caption=final_caption, progress=progress, progress_args=[message, "up"])
+            sent = await limiter.call(client, "send", message.chat.id, lambda: client.send_video(message.chat.id, file, duration=msg.video.duration, width=msg.video.width, height=msg.video.height, thumb=ph_path, caption=final_caption, progress=progress, progress_args=[message, key]))
         elif msg_type == "Audio":
-            await client.send_audio(message.chat.id, file, thumb=ph_path, caption=final_caption, progress=progress, progress_args=[message, "up"])
+            sent = await limiter.call(client, "send", message.chat.id, lambda: client.send_audio(message.chat.id, file, thumb=ph_path, caption=final_caption, progress=progress, progress_args=[message, key]))
         elif msg_type == "Photo":
-            await client.send_photo(message.chat.id, file, caption=final_caption)
+            sent = await limiter.call(client, "send", message.chat.id, lambda: client.send_photo(message.chat.id, file, caption=final_caption))
+
+        # Remember the bot-side file_id so the next request for this post skips the transfer
+        if sent:
+            usage.record(message.from_user.id, saves=1, bytes_up=file_size or (os.path.getsize(file) if file else 0))
+        sent_media = get_media(sent, msg_type) if sent else None
+        if sent_media:
+            entry = await file_cache.put(item["key"], sent_media.file_id, file_name, file_size)
         
+    except asyncio.CancelledError:
+        await discard_item(client, item)
+        raise
     except Exception as e:
-         await smsg.edit(f"Upload Failed: {e}")
+         usage.record(message.from_user.id, failures=1)
+         text = f"Upload Failed: {e}"
+         await limiter.call(client, "edit", message.chat.id, lambda: smsg.edit(text))
+    finally:
+        progress_bus.stop(key)
+        if flight:
+            transfers.finish(flight, entry=entry)
 
     # Final Cleanup
-    if os.path.exists(f'{message.id}upstatus.txt'): os.remove(f'{message.id}upstatus.txt')
     if os.path.exists(temp_dir): shutil.rmtree(temp_dir)
-    await client.delete_messages(message.chat.id, [smsg.id])
+    if item.get("lease"): media_cache.release(item["lease"])
+    await limiter.call(client, "edit", message.chat.id, lambda: client.delete_messages(message.chat.id, [smsg.id]))
+    return sent is not None
+
+async def discard_item(client: Client, item):
+    """Drops an item that will never be uploaded (batch cancelled): files first, then the status message."""
+    if item is None:
+        return
+    if item.get("flight"):
+        item["flight"].cancel()
+    if item.get("lead"):
+        # Relayed but never sent: followers fall back to their own transfer
+        transfers.finish(item.pop("lead"))
+    if "smsg" not in item:
+        return
+    temp_dir = item.get("temp_dir")
+    if temp_dir and os.path.exists(temp_dir): shutil.rmtree(temp_dir)
+    if item.get("lease"): media_cache.release(item.pop("lease"))
+    try:
+        await limiter.call(client, "edit", item["smsg"].chat.id, lambda: item["smsg"].edit("❌ **Task Cancelled**"))
+    except:
+        pass
 
 # ==============================================================================
 # 🖱️ CALLBACK QUERY HANDLER (Upgraded Buttons)
@@ -10,8 +10,7 @@ async def set_custom_thumbnail(client: Client, message: Message):
     user_id = message.from_user.id
     
     # 1. Ensure User Exists
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     # 2. Validate Reply
     if not message.reply_to_message or not message.reply_to_message.photo:
@@ -44,8 +43,7 @@ async def set_custom_thumbnail(client: Client, message: Message):
 async def view_custom_thumbnail(client: Client, message: Message):
     user_id = message.from_user.id
     
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     thumb_id = await db.get_thumbnail(user_id)
 
@@ -77,8 +75,7 @@ async def view_custom_thumbnail(client: Client, message: Message):
 async def delete_custom_thumbnail(client: Client, message: Message):
     user_id = message.from_user.id
     
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     thumb_id = await db.get_thumbnail(user_id)
 
@@ -103,8 +100,7 @@ async def delete_custom_thumbnail(client: Client, message: Message):
 @Client.on_message(filters.command("thumb_mode") & filters.private)
 async def thumbnail_status(client: Client, message: Message):
     user_id = message.from_user.id
-    if not await db.is_user_exist(user_id):
-        await db.add_user(user_id, message.from_user.first_name)
+    await db.ensure_user(user_id, message.from_user.first_name)
 
     thumb_id = await db.get_thumbnail(user_id)
 
@@ -4,10 +4,18 @@ import sys
 import os
 from datetime import timezone, timedelta
 from pyrogram import Client, filters, enums, __version__ as pyrogram_version
-from pyrogram.types import Message, BotCommand
+from pyrogram.types import Message, CallbackQuery, BotCommand
 from pyrogram.errors import FloodWait, RPCError
 from config import API_ID, API_HASH, BOT_TOKEN, LOG_CHANNEL, ADMINS
 from database.db import db
+from utils.pool import user_pool
+from utils.usage import usage
+from utils.entitlements import entitlements
+from utils.download import downloader
+from utils.media import close_media_sessions
+from utils.jobs import job_store
+from utils.scheduler import scheduler
+from Rexbots.start import resume_jobs
 from logger import LOGGER
 
 # Keep-alive server (Render / Heroku)
@@ -78,14 +86,26 @@ class Bot(Client):
 
         me = await self.get_me()
 
-        # 3. DB Stats
+        # Partial downloads a retry will no longer pick up, swept now and every hour
+        downloader.start_sweeper()
+
+        # 3. DB Indexes & Stats
         try:
+            await db.setup()
+            await entitlements.load()
+            await db.load_banned()
             user_count = await db.total_users_count()
             logger.info(f"MongoDB Connected: {user_count} users found.")
         except Exception as e:
             logger.error(f"DB stats failed: {e}")
             user_count = "Unknown"
 
+        # Batches a restart interrupted continue from their last checkpoint
+        try:
+            await resume_jobs(self)
+        except Exception as e:
+            logger.error(f"Resuming batch jobs failed: {e}")
+
         # 4. Startup notification
         now = datetime.datetime.now(IST)
         startup_text = (
@@ -109,6 +129,15 @@ class Bot(Client):
             await self.send_message(LOG_CHANNEL, "<b><i>❌ Bot is going Offline</i></b>")
         except:
             pass
+        # Before the sessions go: jobs torn down from here on keep their stored copy
+        # and resume from their last delivered message
+        await job_store.close()
+        await scheduler.shutdown()
+        await user_pool.close_all()
+        await close_media_sessions(self)
+        await usage.close()
+        entitlements.stop()
+        downloader.stop()
         await asyncio.shield(super().stop())
         logger.info("Bot stopped cleanly")
 
@@ -137,15 +166,24 @@ class Bot(Client):
 
 BotInstance = Bot()
 
+# Banned users are dropped before any plugin or DB work (in-memory set, no query)
+banned = filters.create(lambda _, __, update: bool(update.from_user) and update.from_user.id in db.banned_ids and update.from_user.id not in ADMINS)
+
+@BotInstance.on_message(banned & filters.incoming, group=-2)
+async def drop_banned_message(bot: Client, message: Message):
+    message.stop_propagation()
+
+@BotInstance.on_callback_query(banned, group=-2)
+async def drop_banned_callback(bot: Client, callback_query: CallbackQuery):
+    callback_query.stop_propagation()
+
 @BotInstance.on_message(filters.private & filters.incoming, group=-1)
 async def new_user_log(bot: Client, message: Message):
     user = message.from_user
     if not user or user.id in USER_CACHE:
         return
 
-    if not await db.is_user_exist(user.id):
-        await db.add_user(user.id, user.first_name)
-        
+    if await db.ensure_user(user.id, user.first_name):
         now = datetime.datetime.now(IST)
         log_text = (
             f"<b>#NewUser 👤</b>\n"
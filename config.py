@@ -15,6 +15,59 @@ DB_NAME = os.environ.get("DB_NAME", "")
 LOG_CHANNEL = -1003656791142
 ERROR_MESSAGE = bool(os.environ.get('ERROR_MESSAGE', True))
 KEEP_ALIVE_URL = os.environ.get("KEEP_ALIVE_URL", "")
+
+# User Session Pool
+USER_POOL_IDLE_TIMEOUT = int(os.environ.get("USER_POOL_IDLE_TIMEOUT", "600"))      # Seconds before an idle session is closed
+USER_POOL_HEALTH_INTERVAL = int(os.environ.get("USER_POOL_HEALTH_INTERVAL", "60"))  # Seconds between liveness pings
+
+# Batch Pipeline (fetch -> download -> upload)
+FREE_DOWNLOAD_WORKERS = int(os.environ.get("FREE_DOWNLOAD_WORKERS", "1"))        # Parallel downloads per free job
+PREMIUM_DOWNLOAD_WORKERS = int(os.environ.get("PREMIUM_DOWNLOAD_WORKERS", "3"))  # Parallel downloads per premium job
+PIPELINE_FETCH_DEPTH = int(os.environ.get("PIPELINE_FETCH_DEPTH", "10"))         # Resolved messages waiting for download
+PIPELINE_UPLOAD_DEPTH = int(os.environ.get("PIPELINE_UPLOAD_DEPTH", "2"))        # Downloads waiting for upload
+
+# Streaming Relay (user download piped straight into the bot upload)
+STREAM_RELAY = os.environ.get("STREAM_RELAY", "True").lower() == "true"
+RELAY_BUFFER_MB = int(os.environ.get("RELAY_BUFFER_MB", "8"))                    # In-memory buffer per relayed file
+
+# Parallel Downloads (several media connections per large file, 1 or 0 = off)
+PARALLEL_DOWNLOAD_CONNECTIONS = int(os.environ.get("PARALLEL_DOWNLOAD_CONNECTIONS", "4"))
+PARALLEL_DOWNLOAD_MIN_MB = int(os.environ.get("PARALLEL_DOWNLOAD_MIN_MB", "20"))  # Smaller files use one connection
+PARALLEL_UPLOAD_CONNECTIONS = int(os.environ.get("PARALLEL_UPLOAD_CONNECTIONS", "4"))  # 0 disables parallel uploads
+PARALLEL_UPLOAD_WINDOW = int(os.environ.get("PARALLEL_UPLOAD_WINDOW", "8"))       # 512 KB parts in flight per upload
+
+# Resumable Downloads (unfinished parallel downloads kept on disk with a part manifest)
+PARTIAL_DOWNLOAD_DIR = os.environ.get("PARTIAL_DOWNLOAD_DIR", "downloads/.partial")
+PARTIAL_DOWNLOAD_TTL_HOURS = int(os.environ.get("PARTIAL_DOWNLOAD_TTL_HOURS", "24"))  # Older partials are deleted (at startup and hourly)
+
+# File ID Cache (source post -> bot-side file_id)
+FILE_CACHE_SIZE = int(os.environ.get("FILE_CACHE_SIZE", "5000"))                 # Entries kept in the in-process LRU
+
+# Local Media Cache (downloaded files kept on disk by file_unique_id, 0 = off)
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", "downloads/.cache")
+MEDIA_CACHE_MB = int(os.environ.get("MEDIA_CACHE_MB", "0"))
+
+# Progress Status Messages
+PROGRESS_INTERVAL = int(os.environ.get("PROGRESS_INTERVAL", "5"))                # Seconds between status edits
+
+# Job Scheduler (global concurrency, one running job per user)
+MAX_ACTIVE_JOBS = int(os.environ.get("MAX_ACTIVE_JOBS", "5"))                    # Link jobs running at once
+PREMIUM_BURST = int(os.environ.get("PREMIUM_BURST", "3"))                        # Premium starts before a free user gets a turn
+
+# User Document Cache (in-process, write-through)
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "5000"))                 # Users kept in memory
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "300"))                    # Seconds before a cached user is refetched
+
+# Usage Analytics (write-behind counters)
+USAGE_FLUSH_INTERVAL = int(os.environ.get("USAGE_FLUSH_INTERVAL", "5"))          # Seconds between bulk flushes
+
+# Durable Batch Jobs (range links stored in MongoDB and resumed after a restart)
+JOB_CHECKPOINT_INTERVAL = int(os.environ.get("JOB_CHECKPOINT_INTERVAL", "5"))    # Seconds between progress writes per batch
+
+# Rate Limiter (token buckets per client, method class and chat, adapted on FloodWait)
+RATE_LIMIT_CHAT = float(os.environ.get("RATE_LIMIT_CHAT", "1"))        # Starting sends/copies per second to one chat
+RATE_LIMIT_GLOBAL = float(os.environ.get("RATE_LIMIT_GLOBAL", "25"))   # Starting sends/copies per second per client
+FLOOD_WAIT_RETRIES = int(os.environ.get("FLOOD_WAIT_RETRIES", "3"))    # Retries of a call answered with FloodWait
 # Rexbots
 # Don't Remove Credit
 # Telegram Channel @RexBots_Official
@@ -1,14 +1,148 @@
 import motor.motor_asyncio
 import datetime
-from config import DB_NAME, DB_URI
+import re
+import time
+from collections import OrderedDict
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError
+from config import DB_NAME, DB_URI, USER_CACHE_SIZE, USER_CACHE_TTL
 from logger import LOGGER
 logger = LOGGER(__name__)
+class QueryCounter(monitoring.CommandListener):
+    """Counts the commands sent to MongoDB by name (find, update, insert, ...)."""
+    def __init__(self):
+        self.counts = {}
+    def started(self, event):
+        self.counts[event.command_name] = self.counts.get(event.command_name, 0) + 1
+    def succeeded(self, event):
+        pass
+    def failed(self, event):
+        pass
+    def total(self):
+        return sum(self.counts.values())
+def premium_expiry_moment(value):
+    """
+    When a stored premium_expiry runs out, as a datetime (None = permanent).
+    /add_premium stores ISO dates; premium ends when that day starts.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time.min)
+    return datetime.datetime.fromisoformat(str(value))
+def encode_key(key):
+    """Makes a word usable as a MongoDB field name ('%' first so decoding is unambiguous)."""
+    return key.replace('%', '%25').replace('.', '%2E').replace('$', '%24')
+def decode_key(key):
+    return key.replace('%24', '$').replace('%2E', '.').replace('%25', '%')
+def is_encoded_key(key):
+    """False for raw words stored before keys were encoded ('.', '$' or a bare '%' in them)."""
+    return '.' not in key and '$' not in key and re.fullmatch(r'([^%]|%25|%2E|%24)*', key) is not None
 class Database:
+    # Everything the download path reads, fetched once per job by get_profile
+    PROFILE_FIELDS = {
+        '_id': 0, 'session': 1, 'is_premium': 1, 'premium_expiry': 1,
+        'daily_usage': 1, 'limit_reset_time': 1, 'thumbnail': 1, 'caption': 1,
+        'delete_words': 1, 'replace_words': 1, 'dump_chat': 1
+    }
+    # Indexes created by setup(): (collection attribute, keys, create_index options)
+    INDEXES = [
+        ('col', 'id', {'unique': True}),
+        ('col', [('is_premium', 1), ('premium_expiry', 1)], {'partialFilterExpression': {'is_premium': True}}),
+        ('col', 'is_banned', {'partialFilterExpression': {'is_banned': True}}),
+        ('jobs', 'user_id', {}),     # /cancel and bans drop a user's stored jobs
+        ('jobs', 'submitted', {}),   # Bot.start resumes jobs in submission order
+    ]
+    # Queries setup() checks with explain() once the indexes exist
+    HOT_QUERIES = [
+        ('col', {'id': 0}),
+        ('col', {'is_premium': True}),
+        ('col', {'is_premium': True, 'premium_expiry': {'$lte': datetime.datetime(2000, 1, 1)}}),
+        ('col', {'is_banned': True}),
+        ('jobs', {'user_id': 0}),
+    ]
    
     def __init__(self, uri, database_name):
-        self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+        self.queries = QueryCounter()
+        self._client = motor.motor_asyncio.AsyncIOMotorClient(uri, event_listeners=[self.queries])
         self.db = self._client[database_name]
         self.col = self.db.users
+        self.files = self.db.file_cache
+        self.usage = self.db.usage
+        self.jobs = self.db.jobs
+        # Write-through cache of user documents: id -> (expires_at, doc), oldest first
+        self._users = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Banned ids, loaded at startup and kept in sync by the ban setters
+        self.banned_ids = set()
+    # User Document Cache
+    def _cache_user(self, id, doc):
+        self._users[int(id)] = (time.monotonic() + USER_CACHE_TTL, doc)
+        self._users.move_to_end(int(id))
+        while len(self._users) > USER_CACHE_SIZE:
+            self._users.popitem(last=False)
+    def _cached_user(self, id):
+        entry = self._users.get(int(id))
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._users[int(id)]
+            return None
+        self._users.move_to_end(int(id))
+        return entry[1]
+    async def get_user(self, id):
+        """The user's document, from the cache when fresh (a shallow copy, None if unknown)."""
+        user = self._cached_user(id)
+        if user is not None:
+            self.cache_hits += 1
+            return dict(user)
+        self.cache_misses += 1
+        user = await self.col.find_one({'id': int(id)})
+        if user is not None:
+            self._cache_user(id, user)
+            return dict(user)
+        return None
+    async def _update(self, id, update):
+        """update_one on a user, applied to the cached document as well. Returns the UpdateResult."""
+        result = await self.col.update_one({'id': int(id)}, update)
+        user = self._cached_user(id)
+        if user is None:
+            return result
+        if set(update) - {'$set', '$unset'} or any('.' in key for fields in update.values() for key in fields):
+            # $inc / $addToSet / $pull / dotted paths: simpler to refetch than to replay
+            self.invalidate_user(id)
+            return result
+        user.update(update.get('$set', {}))
+        for key in update.get('$unset', {}):
+            user.pop(key, None)
+        return result
+    async def _bulk_set(self, ids, fields):
+        """One bulk_write of the same $set for many users. Returns the BulkWriteResult."""
+        result = await self.col.bulk_write([UpdateOne({'id': int(i)}, {'$set': fields}) for i in ids], ordered=False)
+        for i in ids:
+            user = self._cached_user(i)
+            if user is not None:
+                user.update(fields)
+        logger.info(f"Bulk update {list(fields)} on {len(ids)} users: {result.matched_count} matched, {result.modified_count} modified")
+        return result
+    def invalidate_user(self, id=None):
+        """Drops one cached user, or the whole cache when id is None. Returns how many were dropped."""
+        if id is None:
+            count = len(self._users)
+            self._users.clear()
+            return count
+        return 1 if self._users.pop(int(id), None) else 0
+    def user_cache_stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._users),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": (self.cache_hits / lookups * 100) if lookups else 0.0,
+        }
     def new_user(self, id, name):
         return dict(
             id = id,
@@ -21,11 +155,93 @@ class Database:
     async def add_user(self, id, name):
         user = self.new_user(id, name)
         await self.col.insert_one(user)
+        self._cache_user(id, user)
+        logger.info(f"New user added to DB: {id} - {name}")
+    async def ensure_user(self, id, name):
+        """
+        Makes sure the user has a document, in one upsert ($setOnInsert) at most.
+        Returns True if the user was created by this call.
+        """
+        if self._cached_user(id) is not None:
+            return False
+        fields = self.new_user(int(id), name)
+        del fields['id']
+        try:
+            user = await self.col.find_one_and_update(
+                {'id': int(id)},
+                {'$setOnInsert': fields},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # A concurrent first message inserted it between our match and insert
+            return False
+        if user is not None:
+            self._cache_user(id, user)
+            return False
+        self._cache_user(id, self.new_user(int(id), name))
         logger.info(f"New user added to DB: {id} - {name}")
+        return True
+    async def setup(self):
+        """
+        Creates the declared indexes (idempotent, run once at startup), logging how
+        long each took, then checks with explain() that the hot queries use them.
+        """
+        for collection, keys, options in self.INDEXES:
+            started = time.perf_counter()
+            try:
+                name = await getattr(self, collection).create_index(keys, **options)
+                logger.info(f"Index {collection}.{name} ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+            except Exception as e:
+                logger.error(f"Could not create index {keys} on {collection}: {e}")
+        for collection, query in self.HOT_QUERIES:
+            try:
+                plan = await getattr(self, collection).find(query).explain()
+                stages = self._plan_stages(plan.get('queryPlanner', {}).get('winningPlan', {}))
+                if 'IXSCAN' in stages or 'IDHACK' in stages or 'EXPRESS_IXSCAN' in stages:
+                    logger.info(f"Query {query} on {collection} uses an index ({' > '.join(stages)})")
+                else:
+                    logger.warning(f"Query {query} on {collection} is a collection scan ({' > '.join(stages)})")
+            except Exception as e:
+                logger.warning(f"explain() failed for {query} on {collection}: {e}")
+        try:
+            await self.migrate_replace_words()
+        except Exception as e:
+            logger.error(f"replace_words migration failed: {e}")
+    async def migrate_replace_words(self):
+        """
+        Re-encodes replace_words keys stored raw by older versions: a word with '.'
+        or '%' in it cannot be addressed as replace_words.<key> to be removed.
+        Returns how many users were rewritten.
+        """
+        ops, ids = [], []
+        async for user in self.col.find({'replace_words': {'$exists': True, '$ne': {}}}, {'_id': 0, 'id': 1, 'replace_words': 1}):
+            words = user.get('replace_words') or {}
+            if all(is_encoded_key(k) for k in words):
+                continue
+            fixed = {k if is_encoded_key(k) else encode_key(k): v for k, v in words.items()}
+            ops.append(UpdateOne({'id': user['id']}, {'$set': {'replace_words': fixed}}))
+            ids.append(user['id'])
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
+            for user_id in ids:
+                self.invalidate_user(user_id)
+            logger.info(f"Re-encoded legacy replace_words keys of {len(ops)} users")
+        return len(ops)
+    @classmethod
+    def _plan_stages(cls, plan):
+        """Stage names of an explain() plan, outermost first."""
+        if 'queryPlan' in plan:
+            # Slot-based engine: the classic stage tree sits under queryPlan
+            return cls._plan_stages(plan['queryPlan'])
+        stages = [plan['stage']] if 'stage' in plan else []
+        for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+            if child:
+                stages += cls._plan_stages(child)
+        return stages
    
     async def is_user_exist(self, id):
-        user = await self.col.find_one({'id':int(id)})
-        return bool(user)
+        return bool(await self.get_user(id))
    
     async def total_users_count(self):
         count = await self.col.count_documents({})
@@ -34,35 +250,43 @@ class Database:
         return self.col.find({})
     async def delete_user(self, user_id):
         await self.col.delete_many({'id': int(user_id)})
+        self.invalidate_user(user_id)
         logger.info(f"User deleted from DB: {user_id}")
     async def set_session(self, id, session):
-        await self.col.update_one({'id': int(id)}, {'$set': {'session': session}})
+        await self._update(id, {'$set': {'session': session}})
+    async def get_profile(self, id):
+        """The fields a save job needs, from the cached document or one fetch (None if the user is unknown)."""
+        user = await self.get_user(id)
+        if user is None:
+            return None
+        return {key: user[key] for key, wanted in self.PROFILE_FIELDS.items() if wanted and key in user}
     async def get_session(self, id):
-        user = await self.col.find_one({'id': int(id)})
+        user = await self.get_user(id)
         return user.get('session')
     # Caption Support
     async def set_caption(self, id, caption):
-        await self.col.update_one({'id': int(id)}, {'$set': {'caption': caption}})
+        await self._update(id, {'$set': {'caption': caption}})
     async def get_caption(self, id):
-        user = await self.col.find_one({'id': int(id)})
+        user = await self.get_user(id)
         return user.get('caption', None)
     async def del_caption(self, id):
-        await self.col.update_one({'id': int(id)}, {'$unset': {'caption': ""}})
+        await self._update(id, {'$unset': {'caption': ""}})
     # Thumbnail Support
     async def set_thumbnail(self, id, thumbnail):
-        await self.col.update_one({'id': int(id)}, {'$set': {'thumbnail': thumbnail}})
+        await self._update(id, {'$set': {'thumbnail': thumbnail}})
     async def get_thumbnail(self, id):
-        user = await self.col.find_one({'id': int(id)})
+        user = await self.get_user(id)
         return user.get('thumbnail', None)
     async def del_thumbnail(self, id):
-        await self.col.update_one({'id': int(id)}, {'$unset': {'thumbnail': ""}})
+        await self._update(id, {'$unset': {'thumbnail': ""}})
     # Rexbots / Modified by You
     # Don't Remove Credit
     # Telegram Channel @RexBots_Official
     # Premium Support
     async def add_premium(self, id, expiry_date):
+        """Returns False if there is no user with this id (nothing is stored then)."""
         # When user buys premium, we also reset their limits just in case
-        await self.col.update_one({'id': int(id)}, {
+        result = await self._update(id, {
             '$set': {
                 'is_premium': True,
                 'premium_expiry': expiry_date,
@@ -70,110 +294,223 @@ class Database:
                 'limit_reset_time': None
             }
         })
+        if not result.matched_count:
+            logger.warning(f"Premium not granted, unknown user {id}")
+            return False
         logger.info(f"User {id} granted premium until {expiry_date}")
+        return True
     async def remove_premium(self, id):
-        await self.col.update_one({'id': int(id)}, {'$set': {'is_premium': False, 'premium_expiry': None}})
+        await self._update(id, {'$set': {'is_premium': False, 'premium_expiry': None}})
         logger.info(f"User {id} removed from premium")
     async def check_premium(self, id):
-        user = await self.col.find_one({'id': int(id)})
+        """The expiry (True if permanent) while premium is active, else None."""
+        user = await self.get_user(id)
         if user and user.get('is_premium'):
-            return user.get('premium_expiry')
+            moment = premium_expiry_moment(user.get('premium_expiry'))
+            if moment is None or moment > datetime.datetime.now():
+                return user.get('premium_expiry') or True
         return None
+    async def bulk_add_premium(self, ids, expiry_date):
+        return await self._bulk_set(ids, {
+            'is_premium': True,
+            'premium_expiry': expiry_date,
+            'daily_usage': 0,
+            'limit_reset_time': None
+        })
+    async def existing_user_ids(self, ids):
+        """The subset of `ids` that belong to stored users."""
+        return {user['id'] async for user in self.col.find({'id': {'$in': [int(i) for i in ids]}}, {'_id': 0, 'id': 1})}
+    async def bulk_remove_premium(self, ids):
+        return await self._bulk_set(ids, {'is_premium': False, 'premium_expiry': None})
     async def get_premium_users(self):
         return self.col.find({'is_premium': True})
     # Ban Support
     async def ban_user(self, id):
-        await self.col.update_one({'id': int(id)}, {'$set': {'is_banned': True}})
+        await self._update(id, {'$set': {'is_banned': True}})
+        self.banned_ids.add(int(id))
         logger.warning(f"User banned: {id}")
     async def unban_user(self, id):
-        await self.col.update_one({'id': int(id)}, {'$set': {'is_banned': False}})
+        await self._update(id, {'$set': {'is_banned': False}})
+        self.banned_ids.discard(int(id))
         logger.info(f"User unbanned: {id}")
+    async def bulk_set_banned(self, ids, banned):
+        result = await self._bulk_set(ids, {'is_banned': banned})
+        if banned:
+            self.banned_ids.update(int(i) for i in ids)
+        else:
+            self.banned_ids.difference_update(int(i) for i in ids)
+        return result
+    async def load_banned(self):
+        """Fills banned_ids from the DB (served by the partial is_banned index)."""
+        self.banned_ids = {user['id'] async for user in self.col.find({'is_banned': True}, {'_id': 0, 'id': 1})}
+        logger.info(f"Loaded {len(self.banned_ids)} banned users")
     async def is_banned(self, id):
-        user = await self.col.find_one({'id': int(id)})
+        user = await self.get_user(id)
         return user.get('is_banned', False)
     # Dump Chat Support
     async def set_dump_chat(self, id, chat_id):
-        await self.col.update_one({'id': int(id)}, {'$set': {'dump_chat': int(chat_id)}})
+        await self._update(id, {'$set': {'dump_chat': int(chat_id)}})
     async def get_dump_chat(self, id):
-        user = await self.col.find_one({'id': int(id)})
+        user = await self.get_user(id)
         return user.get('dump_chat', None)
     # Delete/Replace Words Support
     async def set_delete_words(self, id, words):
-        await self.col.update_one({'id': int(id)}, {'$addToSet': {'delete_words': {'$each': words}}})
+        await self._update(id, {'$addToSet': {'delete_words': {'$each': words}}})
     async def get_delete_words(self, id):
-        user = await self.col.find_one({'id': int(id)})
-        return user.get('delete_words', [])
+        user = await self.get_user(id)
+        return list(user.get('delete_words', []))
     async def remove_delete_words(self, id, words):
-        await self.col.update_one({'id': int(id)}, {'$pull': {'delete_words': {'$in': words}}})
+        await self._update(id, {'$pull': {'delete_words': {'$in': words}}})
+    # Each pair is its own replace_words.<key> path, so any number of pairs is one atomic update
     async def set_replace_words(self, id, repl_dict):
-        user = await self.col.find_one({'id': int(id)})
-        current_repl = user.get('replace_words', {})
-        current_repl.update(repl_dict)
-        await self.col.update_one({'id': int(id)}, {'$set': {'replace_words': current_repl}})
+        fields = {f'replace_words.{encode_key(k)}': v for k, v in repl_dict.items() if k}
+        if fields:
+            await self._update(id, {'$set': fields})
     async def get_replace_words(self, id):
-        user = await self.col.find_one({'id': int(id)})
-        return user.get('replace_words', {})
+        user = await self.get_user(id)
+        return {decode_key(k): v for k, v in user.get('replace_words', {}).items()}
     async def remove_replace_words(self, id, words):
-        user = await self.col.find_one({'id': int(id)})
-        current_repl = user.get('replace_words', {})
-        for w in words:
-            current_repl.pop(w, None)
-        await self.col.update_one({'id': int(id)}, {'$set': {'replace_words': current_repl}})
+        fields = {f'replace_words.{encode_key(w)}': "" for w in words if w}
+        if fields:
+            await self._update(id, {'$unset': fields})
+    # Usage Analytics Support
+    async def flush_usage(self, batch):
+        """
+        Writes accumulated counters ({(user_id, day): {field: count}}): lifetime
+        totals go to the user documents, per-day rows to the usage collection.
+        """
+        totals = {}
+        daily = []
+        for (user_id, day), counts in batch.items():
+            inc = totals.setdefault(user_id, {})
+            for field, count in counts.items():
+                if count:
+                    inc[f'total_{field}'] = inc.get(f'total_{field}', 0) + count
+            daily.append(UpdateOne(
+                {'_id': f'{user_id}:{day}'},
+                {'$inc': counts, '$setOnInsert': {'id': user_id, 'day': day}},
+                upsert=True
+            ))
+        user_ops = [UpdateOne({'id': user_id}, {'$inc': inc}) for user_id, inc in totals.items() if inc]
+        if user_ops:
+            await self.col.bulk_write(user_ops, ordered=False)
+        if daily:
+            await self.usage.bulk_write(daily, ordered=False)
+        # Keep cached documents in step with the increments
+        for user_id, inc in totals.items():
+            cached = self._cached_user(user_id)
+            if cached is not None:
+                for field, count in inc.items():
+                    cached[field] = cached.get(field, 0) + count
+    async def get_daily_usage(self, id, day):
+        return await self.usage.find_one({'_id': f'{int(id)}:{day}'}) or {}
+    # Durable Batch Jobs (one document per unfinished range link)
+    async def add_job(self, job):
+        await self.jobs.replace_one({'_id': job['_id']}, job, upsert=True)
+    async def checkpoint_jobs(self, checkpoints):
+        """Stores the last finished message id of several jobs ({job_id: last_done}) in one bulk write."""
+        if not checkpoints:
+            return
+        now = datetime.datetime.now()
+        await self.jobs.bulk_write([
+            UpdateOne({'_id': job_id}, {'$set': {'last_done': last_done, 'updated': now}})
+            for job_id, last_done in checkpoints.items()
+        ], ordered=False)
+    async def delete_job(self, job_id):
+        await self.jobs.delete_one({'_id': job_id})
+    async def delete_user_jobs(self, user_ids):
+        result = await self.jobs.delete_many({'user_id': {'$in': [int(i) for i in user_ids]}})
+        return result.deleted_count
+    async def get_jobs(self):
+        return [job async for job in self.jobs.find().sort('submitted', 1)]
+    # File ID Cache Support
+    async def get_cached_file(self, key):
+        return await self.files.find_one({'_id': key})
+    async def cache_file(self, key, entry):
+        await self.files.update_one({'_id': key}, {'$set': entry}, upsert=True)
+    async def del_cached_file(self, key):
+        await self.files.delete_one({'_id': key})
     # --------------------------------------------------------
     # NEW FEATURES: Daily Limits (Free User Restriction)
     # --------------------------------------------------------
-    async def check_limit(self, id):
+    async def check_limit(self, id, user=None, limit=10):
         """
-        Checks if a user has hit their daily limit.
+        Checks if a user has hit their daily limit (read only, the window is reset by consume_quota).
+        `user` is an optional get_profile snapshot, used instead of a fresh fetch.
         Returns: True if BLOCKED (limit reached), False if ALLOWED.
         """
-        user = await self.col.find_one({'id': int(id)})
+        if user is None:
+            user = await self.get_user(id)
         if not user:
             return False # Should be added via add_user, but safe fallback
        
         # 1. Premium Check: Always allowed
         if user.get('is_premium'):
             return False
-        # 2. Check Time Reset
+        # 2. Expired or never started window: allowed (count starts over)
+        reset_time = user.get('limit_reset_time')
+        if reset_time is None or datetime.datetime.now() >= reset_time:
+            return False
+        # 3. Check Count
+        return user.get('daily_usage', 0) >= limit
+    async def consume_quota(self, id, limit=10):
+        """
+        Counts one save against the daily quota in a single atomic find_one_and_update:
+        an expired (or never started) window restarts at 1 with a new 24h timer, otherwise
+        the count goes up only while it is below `limit`. Premium users are not counted.
+        Returns (allowed, remaining); remaining is None for users without a quota.
+        """
         now = datetime.datetime.now()
+        premium = {'$eq': ['$is_premium', True]}
+        expired = {'$lte': [{'$ifNull': ['$limit_reset_time', None]}, now]}
+        usage = {'$ifNull': ['$daily_usage', 0]}
+        # The pipeline sees the document as it was, so both fields use the same decision
+        user = await self.col.find_one_and_update(
+            {'id': int(id)},
+            [{'$set': {
+                'daily_usage': {'$switch': {
+                    'branches': [
+                        {'case': premium, 'then': usage},
+                        {'case': expired, 'then': 1},
+                        {'case': {'$lt': [usage, limit]}, 'then': {'$add': [usage, 1]}}
+                    ],
+                    'default': usage
+                }},
+                'limit_reset_time': {'$cond': [
+                    {'$and': [{'$not': [premium]}, expired]},
+                    now + datetime.timedelta(hours=24),
+                    '$limit_reset_time'
+                ]}
+            }}],
+            projection={'_id': 0, 'is_premium': 1, 'daily_usage': 1, 'limit_reset_time': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        # Same decision as the pipeline, taken on the document it was applied to
+        if not user or user.get('is_premium'):
+            return True, None
         reset_time = user.get('limit_reset_time')
-       
-        # If reset time has passed or was never set, reset count to 0
         if reset_time is None or now >= reset_time:
-            await self.col.update_one(
-                {'id': int(id)},
-                {'$set': {'daily_usage': 0, 'limit_reset_time': None}}
-            )
-            return False # Allowed (count is 0)
-        # 3. Check Count
-        usage = user.get('daily_usage', 0)
-        if usage >= 10:
-            return True # Blocked
-       
-        return False # Allowed
+            used, reset_time = 0, now + datetime.timedelta(hours=24)
+        else:
+            used = user.get('daily_usage', 0)
+        if used >= limit:
+            return False, 0
+        # Keep the cached document in step with the write
+        cached = self._cached_user(id)
+        if cached is not None:
+            cached['daily_usage'] = used + 1
+            cached['limit_reset_time'] = reset_time
+        return True, limit - used - 1
+    async def refund_quota(self, id):
+        """Gives back one save counted by consume_quota that was never delivered."""
+        await self.col.update_one({'id': int(id), 'daily_usage': {'$gt': 0}}, {'$inc': {'daily_usage': -1}})
+        cached = self._cached_user(id)
+        if cached is not None and cached.get('daily_usage', 0) > 0:
+            cached['daily_usage'] -= 1
     async def add_traffic(self, id):
         """
         Increments usage count.
         If it's the first save of the cycle, sets the 24h timer.
         """
-        user = await self.col.find_one({'id': int(id)})
-       
-        # If premium, do nothing or track stats if you want (currently strictly for limit logic)
-        if user.get('is_premium'):
-            return
-        now = datetime.datetime.now()
-        reset_time = user.get('limit_reset_time')
-        # Logic: If timer is not running (None), start it for 24 hours from NOW.
-        if reset_time is None:
-            new_reset_time = now + datetime.timedelta(hours=24)
-            await self.col.update_one(
-                {'id': int(id)},
-                {'$set': {'daily_usage': 1, 'limit_reset_time': new_reset_time}}
-            )
-        else:
-            # Just increment
-            await self.col.update_one(
-                {'id': int(id)},
-                {'$inc': {'daily_usage': 1}}
-            )
+        await self.consume_quota(id)
 db = Database(DB_URI, DB_NAME)
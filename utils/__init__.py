@@ -0,0 +1,5 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+# Shared transfer engine helpers used by the Rexbots plugins.
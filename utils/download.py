@@ -0,0 +1,359 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import json
+import math
+import os
+import shutil
+import time
+from collections import deque
+from pyrogram import raw
+from pyrogram.errors import FloodWait
+from pyrogram.file_id import FileId
+from config import (
+    PARALLEL_DOWNLOAD_CONNECTIONS, PARALLEL_DOWNLOAD_MIN_MB,
+    PARTIAL_DOWNLOAD_DIR, PARTIAL_DOWNLOAD_TTL_HOURS
+)
+from logger import LOGGER
+from utils.media import call_progress, dc_media_sessions, get_media
+
+logger = LOGGER(__name__)
+
+# upload.getFile: limit at most 1 MB, offsets aligned to it, no 1 MB boundary crossed
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_SAVE_INTERVAL = 2   # Seconds between manifest writes while downloading
+PARTIAL_SWEEP_INTERVAL = 3600   # Seconds between sweeps of stale partial downloads
+
+
+class DownloadError(Exception):
+    pass
+
+
+class FloodThrottle:
+    """
+    Adaptive cap on in-flight part requests: halved on every FloodWait, raised by
+    one again after a streak of clean requests, never above the connection count.
+    A FloodWait also pauses every worker until the wait Telegram asked for is over.
+    """
+
+    def __init__(self, limit):
+        self.max = self.limit = max(1, limit)
+        self.active = 0
+        self.floods = 0
+        self.paused_until = 0.0
+        self._streak = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.active < self.limit)
+                if self.paused_until <= time.monotonic():
+                    self.active += 1
+                    return
+
+    async def release(self, flood_wait=None):
+        """`flood_wait`: seconds of the FloodWait the request got, None if it went through."""
+        async with self._cond:
+            self.active -= 1
+            if flood_wait is not None:
+                self.paused_until = max(self.paused_until, time.monotonic() + flood_wait)
+                self.floods += 1
+                self.limit = max(1, self.limit // 2)
+                self._streak = 0
+            else:
+                self._streak += 1
+                if self.limit < self.max and self._streak >= 16:
+                    self.limit += 1
+                    self._streak = 0
+            self._cond.notify_all()
+
+
+class PartManifest:
+    """
+    Sidecar of a partial download (<file>.json): the file_unique_id, the total size
+    and the byte ranges already on disk. It is written atomically and only after an
+    fdatasync of the data file, so it never claims bytes that are not there.
+    """
+
+    def __init__(self, path, file_unique_id, size):
+        self.path = path
+        self.file_unique_id = file_unique_id
+        self.size = size
+        self.parts = set()
+        self._saved = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def load(self):
+        """Reads the parts an earlier attempt finished. False if there is no matching manifest."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("file_unique_id") != self.file_unique_id or data.get("size") != self.size:
+            return False
+        for start, end in data.get("ranges", []):
+            self.parts.update(range(start // CHUNK_SIZE, math.ceil(end / CHUNK_SIZE)))
+        return True
+
+    def ranges(self):
+        ranges = []
+        for part in sorted(self.parts):
+            start, end = part * CHUNK_SIZE, min((part + 1) * CHUNK_SIZE, self.size)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def completed_bytes(self):
+        return sum(end - start for start, end in self.ranges())
+
+    def _write(self, fd, ranges):
+        getattr(os, "fdatasync", os.fsync)(fd)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"file_unique_id": self.file_unique_id, "size": self.size, "ranges": ranges}, f)
+        os.replace(tmp, self.path)
+
+    async def save(self, fd, force=False):
+        """Persists the manifest, at most every MANIFEST_SAVE_INTERVAL seconds unless forced."""
+        if not force and time.monotonic() - self._saved < MANIFEST_SAVE_INTERVAL:
+            return
+        async with self._lock:
+            self._saved = time.monotonic()
+            await asyncio.get_running_loop().run_in_executor(None, self._write, fd, self.ranges())
+
+    def remove(self):
+        for path in (self.path, self.path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ParallelDownloader:
+    """
+    Fetches a document in 1 MB parts over several media connections at once.
+    to_file() writes the parts at their offset into a preallocated file.
+    """
+
+    def __init__(self, connections=PARALLEL_DOWNLOAD_CONNECTIONS, min_size=PARALLEL_DOWNLOAD_MIN_MB * 1024 * 1024, partial_dir=PARTIAL_DOWNLOAD_DIR):
+        self.connections = connections
+        self.min_size = min_size
+        self.partial_dir = partial_dir
+        self._active = set()   # file_unique_ids with a partial file open
+        self._sweeper = None
+        self.downloads = 0
+        self.failures = 0
+        self.floods = 0
+        self.bytes = 0
+        self.resumed = 0
+        self.resumed_bytes = 0
+
+    def can_download(self, msg_type, file_size):
+        return self.connections > 1 and msg_type in ("Document", "Video", "Audio") and file_size >= self.min_size
+
+    async def _fetch(self, acc, msg, msg_type, file_size, sink, skip=(), progress=None, progress_args=()):
+        """Runs one worker per connection until every part not in `skip` reached `sink(index, data)`."""
+        file_id = FileId.decode(get_media(msg, msg_type).file_id)
+        location = raw.types.InputDocumentFileLocation(
+            id=file_id.media_id,
+            access_hash=file_id.access_hash,
+            file_reference=file_id.file_reference,
+            thumb_size=file_id.thumbnail_size
+        )
+        order = [part for part in range(math.ceil(file_size / CHUNK_SIZE)) if part not in skip]
+        if not order:
+            return
+        connections = min(self.connections, len(order))
+        throttle = FloodThrottle(connections)
+        retry = deque()
+        next_index = 0
+        done = file_size - sum(min(CHUNK_SIZE, file_size - part * CHUNK_SIZE) for part in order)
+
+        async def claim():
+            nonlocal next_index
+            if retry:
+                return retry.popleft()
+            if next_index >= len(order):
+                return None
+            next_index += 1
+            return order[next_index - 1]
+
+        async def worker(session):
+            nonlocal done
+            while True:
+                part = await claim()
+                if part is None:
+                    return
+                await throttle.acquire()
+                flood = None
+                try:
+                    r = await session.invoke(
+                        raw.functions.upload.GetFile(location=location, offset=part * CHUNK_SIZE, limit=CHUNK_SIZE),
+                        sleep_threshold=0
+                    )
+                except FloodWait as e:
+                    flood = e
+                finally:
+                    await throttle.release(flood.value if flood else None)
+                if flood:
+                    # Back off: the part goes back to the front, the throttle holds every worker
+                    retry.appendleft(part)
+                    self.floods += 1
+                    continue
+                if not isinstance(r, raw.types.upload.File):
+                    raise DownloadError(f"Unsupported getFile answer {type(r).__name__} (CDN file?)")
+                expected = min(CHUNK_SIZE, file_size - part * CHUNK_SIZE)
+                if len(r.bytes) != expected:
+                    raise DownloadError(f"Part {part} returned {len(r.bytes)} of {expected} bytes")
+                await sink(part, r.bytes)
+                done += len(r.bytes)
+                self.bytes += len(r.bytes)
+                await call_progress(progress, done, file_size, progress_args)
+
+        async with dc_media_sessions(acc, file_id.dc_id, connections) as sessions:
+            workers = [asyncio.get_running_loop().create_task(worker(session)) for session in sessions]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    async def to_file(self, acc, msg, msg_type, path, file_size, progress=None, progress_args=()):
+        """
+        Downloads into `path`. Parts land at their offsets with pwrite in a file
+        preallocated under `partial_dir` and named after the file_unique_id; its
+        manifest lets a retry, even after a restart, skip the parts already there.
+        The finished file is moved to `path`; a failed one stays for the next attempt,
+        unless it failed with a DownloadError that no retry gets past.
+        """
+        uid = get_media(msg, msg_type).file_unique_id
+        manifest = None
+        resumed = False
+        target = path
+        # The same file downloading twice at once: the second one skips the partial store
+        if uid not in self._active:
+            self._active.add(uid)
+            os.makedirs(self.partial_dir, exist_ok=True)
+            target = os.path.join(self.partial_dir, uid)
+            manifest = PartManifest(target + ".json", uid, file_size)
+            resumed = os.path.exists(target) and os.path.getsize(target) == file_size and manifest.load()
+
+        loop = asyncio.get_running_loop()
+        fd = os.open(target, os.O_RDWR | os.O_CREAT | (0 if resumed else os.O_TRUNC), 0o644)
+        try:
+            if resumed:
+                completed = manifest.completed_bytes()
+                self.resumed += 1
+                self.resumed_bytes += completed
+                logger.info(f"Resuming {uid} at {completed} of {file_size} bytes")
+            else:
+                try:
+                    os.posix_fallocate(fd, 0, file_size)
+                except (AttributeError, OSError):
+                    os.ftruncate(fd, file_size)
+
+            async def sink(part, data):
+                await loop.run_in_executor(None, os.pwrite, fd, data, part * CHUNK_SIZE)
+                if manifest:
+                    manifest.parts.add(part)
+                    await manifest.save(fd)
+
+            await self._fetch(
+                acc, msg, msg_type, file_size, sink,
+                skip=set(manifest.parts) if manifest else (),
+                progress=progress, progress_args=progress_args
+            )
+            self.downloads += 1
+        except BaseException as error:
+            self.failures += 1
+            resumable = manifest is not None and not isinstance(error, DownloadError)
+            if resumable:
+                try:
+                    await manifest.save(fd, force=True)
+                except Exception as e:
+                    logger.warning(f"Could not save the manifest of {uid}: {e}")
+            os.close(fd)
+            fd = None
+            if not resumable:
+                # Nothing to resume: free the preallocated space now, not at the next sweep
+                if os.path.exists(target):
+                    os.remove(target)
+                if manifest:
+                    manifest.remove()
+            raise
+        finally:
+            if fd is not None:
+                os.close(fd)
+            if manifest:
+                self._active.discard(uid)
+
+        if manifest:
+            shutil.move(target, path)
+            manifest.remove()
+        return path
+
+    def cleanup_partials(self, max_age=PARTIAL_DOWNLOAD_TTL_HOURS * 3600):
+        """
+        Deletes partial downloads untouched for `max_age` seconds, or missing their
+        data or manifest. Downloads running right now are left alone.
+        """
+        if not os.path.isdir(self.partial_dir):
+            return 0
+        removed = 0
+        now = time.time()
+        names = set(os.listdir(self.partial_dir))
+        for name in names:
+            if name.split(".", 1)[0] in self._active:
+                continue
+            path = os.path.join(self.partial_dir, name)
+            if name.endswith(".json.tmp"):
+                stale = True
+            elif name.endswith(".json"):
+                stale = name[:-5] not in names
+            else:
+                stale = f"{name}.json" not in names
+            if stale or now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} stale partial download files")
+        return removed
+
+    def start_sweeper(self, interval=PARTIAL_SWEEP_INTERVAL):
+        """Runs cleanup_partials now and then every `interval` seconds."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop(interval))
+
+    async def _sweep_loop(self, interval):
+        while True:
+            try:
+                self.cleanup_partials()
+            except Exception as e:
+                logger.warning(f"Partial download cleanup failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "downloads": self.downloads,
+            "failures": self.failures,
+            "floods": self.floods,
+            "bytes": self.bytes,
+            "resumed": self.resumed,
+            "resumed_bytes": self.resumed_bytes,
+        }
+
+
+downloader = ParallelDownloader()
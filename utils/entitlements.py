@@ -0,0 +1,119 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import datetime
+import heapq
+from database.db import db, premium_expiry_moment
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+_MISSING = object()
+
+
+class PremiumTable:
+    """
+    In-memory table of premium users (user id -> expiry moment, None = permanent),
+    loaded once at startup. Premium checks are a dict lookup.
+
+    Expiries sit in a min-heap; one timer task sleeps until the earliest one and
+    flips that user back to free in the DB. Heap entries are dropped lazily: an
+    entry only counts while it still matches the user's current expiry.
+    """
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._timer = None
+        self.loaded = False
+        self.expired = 0
+
+    async def load(self):
+        self._expiry.clear()
+        self._heap.clear()
+        async for user in await db.get_premium_users():
+            try:
+                self._set(user['id'], premium_expiry_moment(user.get('premium_expiry')))
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping premium entry {user.get('id')}: {e}")
+        self.loaded = True
+        self._start_timer()
+        logger.info(f"Premium table loaded: {len(self._expiry)} users")
+
+    def _set(self, user_id, moment):
+        self._expiry[int(user_id)] = moment
+        if moment is not None:
+            heapq.heappush(self._heap, (moment, int(user_id)))
+
+    def grant(self, user_id, expiry):
+        """Call after db.add_premium; `expiry` as stored (ISO date, datetime or None)."""
+        moment = premium_expiry_moment(expiry)
+        self._set(user_id, moment)
+        if moment is not None and self._heap[0] == (moment, int(user_id)):
+            self._wakeup.set()  # New earliest expiry: re-arm the timer
+        self._start_timer()
+
+    def revoke(self, user_id):
+        """Call after db.remove_premium."""
+        self._expiry.pop(int(user_id), None)
+
+    def is_premium(self, user_id):
+        moment = self._expiry.get(int(user_id), _MISSING)
+        if moment is _MISSING:
+            return False
+        return moment is None or moment > datetime.datetime.now()
+
+    def expiry(self, user_id):
+        return self._expiry.get(int(user_id))
+
+    async def check(self, user_id):
+        """is_premium, falling back to the DB until the table is loaded."""
+        if self.loaded:
+            return self.is_premium(user_id)
+        return bool(await db.check_premium(user_id))
+
+    def _start_timer(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._expiry_loop())
+
+    async def _expiry_loop(self):
+        while True:
+            self._wakeup.clear()
+            delay = None
+            if self._heap:
+                delay = max(0, (self._heap[0][0] - datetime.datetime.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            now = datetime.datetime.now()
+            while self._heap and self._heap[0][0] <= now:
+                moment, user_id = heapq.heappop(self._heap)
+                if self._expiry.get(user_id, _MISSING) != moment:
+                    continue  # Renewed, revoked or made permanent since
+                del self._expiry[user_id]
+                self.expired += 1
+                try:
+                    await db.remove_premium(user_id)
+                    logger.info(f"Premium of {user_id} expired")
+                except Exception as e:
+                    logger.error(f"Could not expire premium of {user_id}: {e}")
+
+    def stop(self):
+        if self._timer:
+            self._timer.cancel()
+
+    def stats(self):
+        return {
+            "premium": len(self._expiry),
+            "permanent": sum(1 for moment in self._expiry.values() if moment is None),
+            "scheduled": len(self._heap),
+            "expired": self.expired,
+        }
+
+
+entitlements = PremiumTable()
@@ -0,0 +1,96 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import datetime
+import hashlib
+from collections import OrderedDict
+from config import FILE_CACHE_SIZE
+from database.db import db
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+def source_key(msg, media):
+    """(source chat, message id, file_unique_id): the bytes of a post, whatever thumbnail they get."""
+    return f"{msg.chat.id}:{msg.id}:{media.file_unique_id}"
+
+
+def cache_key(msg, media, thumb_id=None):
+    """
+    The source key plus the thumbnail variant, since a cached upload carries the
+    thumbnail it was sent with.
+    """
+    variant = hashlib.sha1(thumb_id.encode()).hexdigest()[:12] if thumb_id else "orig"
+    return f"{source_key(msg, media)}:{variant}"
+
+
+class FileIdCache:
+    """
+    Maps a source post to the bot-side file_id of an earlier upload of it.
+    Backed by the file_cache collection with an in-process LRU in front.
+    """
+
+    def __init__(self, size=FILE_CACHE_SIZE):
+        self.size = size
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key, entry):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    async def get(self, key):
+        entry = self._lru.get(key)
+        if entry is not None:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return entry
+        try:
+            entry = await db.get_cached_file(key)
+        except Exception as e:
+            logger.error(f"File cache lookup failed: {e}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    async def put(self, key, file_id, file_name, size):
+        entry = {
+            'file_id': file_id,
+            'file_name': file_name,
+            'size': size,
+            'cached_at': datetime.datetime.now()
+        }
+        self._remember(key, entry)
+        try:
+            await db.cache_file(key, entry)
+        except Exception as e:
+            logger.error(f"File cache write failed: {e}")
+        return entry
+
+    async def invalidate(self, key):
+        self._lru.pop(key, None)
+        try:
+            await db.del_cached_file(key)
+        except Exception as e:
+            logger.error(f"File cache delete failed: {e}")
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "entries": len(self._lru),
+        }
+
+
+file_cache = FileIdCache()
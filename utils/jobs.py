@@ -0,0 +1,145 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import datetime
+import time
+from config import JOB_CHECKPOINT_INTERVAL
+from database.db import db
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+class JobStore:
+    """
+    Durable copy of range-link jobs in the jobs collection. A job is stored when it
+    is queued, checkpointed with the last finished message id while it runs and
+    deleted when it ends; Bot.start requeues whatever is left after a restart.
+
+    Checkpoints stay in memory and go out in one bulk write every `interval`
+    seconds. close() writes the rest on shutdown and from then on ignores
+    checkpoints and keeps the documents of jobs that die with the process.
+    """
+
+    def __init__(self, interval=JOB_CHECKPOINT_INTERVAL):
+        self.interval = interval
+        self._live = {}    # job_id -> progress of a running job
+        self._dirty = {}   # job_id -> last_done not written yet
+        self._flusher = None
+        self.closing = False
+        self.resumed = 0
+        self.writes = 0
+
+    async def create(self, message, from_id, to_id):
+        """Stores a queued range job. Returns its id."""
+        job_id = f"{message.chat.id}:{message.id}"
+        await db.add_job({
+            '_id': job_id,
+            'user_id': message.from_user.id,
+            'chat_id': message.chat.id,
+            'message_id': message.id,
+            'from_id': from_id,
+            'to_id': to_id,
+            'last_done': None,
+            'submitted': datetime.datetime.now()
+        })
+        return job_id
+
+    def start(self, job_id, user_id, from_id, to_id):
+        if job_id is None:
+            return
+        self._live[job_id] = {
+            "user_id": user_id,
+            "from_id": from_id,
+            "to_id": to_id,
+            "last_done": from_id - 1,
+            "done": 0,
+            "started": time.time(),
+        }
+
+    def checkpoint(self, job_id, msg_id):
+        """Marks every message up to `msg_id` as delivered; a no-op once the bot is shutting down."""
+        live = self._live.get(job_id)
+        if live is None or self.closing:
+            return
+        live["done"] += 1
+        live["last_done"] = msg_id
+        self._dirty[job_id] = msg_id
+        self._start_flusher()
+
+    async def finish(self, job_id):
+        """Deletes an ended job; a no-op once the bot is shutting down, so the job resumes."""
+        if job_id is None or self.closing:
+            return
+        self._live.pop(job_id, None)
+        self._dirty.pop(job_id, None)
+        try:
+            await db.delete_job(job_id)
+        except Exception as e:
+            logger.error(f"Could not delete job {job_id}: {e}")
+
+    async def drop_users(self, user_ids):
+        """Deletes every stored job of the users (after /cancel or a ban). Returns how many."""
+        try:
+            return await db.delete_user_jobs(user_ids)
+        except Exception as e:
+            logger.error(f"Could not delete stored jobs: {e}")
+            return 0
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            await db.checkpoint_jobs(batch)
+            self.writes += 1
+        except Exception as e:
+            logger.error(f"Job checkpoint failed, retrying with the next one: {e}")
+            for job_id, last_done in batch.items():
+                self._dirty.setdefault(job_id, last_done)
+
+    def _start_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def close(self):
+        self.closing = True
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+
+    def running(self):
+        """Progress and throughput (messages per minute) of the jobs running right now."""
+        now = time.time()
+        jobs = []
+        for job_id, live in self._live.items():
+            elapsed = max(now - live["started"], 1e-6)
+            jobs.append({
+                "id": job_id,
+                "user_id": live["user_id"],
+                "last_done": live["last_done"],
+                "to_id": live["to_id"],
+                "left": live["to_id"] - live["last_done"],
+                "done": live["done"],
+                "elapsed": elapsed,
+                "rate": live["done"] * 60 / elapsed,
+            })
+        return jobs
+
+    def stats(self):
+        return {
+            "running": len(self._live),
+            "unsaved": len(self._dirty),
+            "resumed": self.resumed,
+            "writes": self.writes,
+        }
+
+
+job_store = JobStore()
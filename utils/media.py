@@ -0,0 +1,166 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import inspect
+import mimetypes
+import weakref
+from contextlib import asynccontextmanager
+from pyrogram import raw, types, utils
+from pyrogram.errors import AuthBytesInvalid
+from pyrogram.session import Session
+from pyrogram.session.auth import Auth
+
+# Telegram upload protocol constants
+PART_SIZE = 512 * 1024                   # Bytes per saveBigFilePart call
+BIG_FILE_THRESHOLD = 10 * 1024 * 1024    # Files above this must use saveBigFilePart
+MAX_IDLE_MEDIA_SESSIONS = 8             # Started media connections kept per client and DC
+
+
+def get_media(msg, msg_type):
+    return getattr(msg, msg_type.lower(), None)
+
+
+def media_file_name(msg, msg_type):
+    """Original file name of the media, or a generated one like pyrogram's downloader."""
+    media = get_media(msg, msg_type)
+    name = getattr(media, "file_name", None)
+    if name:
+        return name
+    ext = mimetypes.guess_extension(getattr(media, "mime_type", None) or "") or ""
+    if not ext:
+        ext = {"Video": ".mp4", "Audio": ".mp3", "Photo": ".jpg"}.get(msg_type, "")
+    return f"{msg_type.lower()}_{msg.id}{ext}"
+
+
+async def call_progress(progress, current, total, progress_args):
+    if progress is None:
+        return
+    result = progress(current, total, *progress_args)
+    if inspect.isawaitable(result):
+        await result
+
+
+class _MediaPool:
+    """Media connections of one client to one DC and the auth key they share."""
+    __slots__ = ("auth_key", "idle", "lock")
+
+    def __init__(self):
+        self.auth_key = None
+        self.idle = []
+        self.lock = asyncio.Lock()
+
+
+# client -> {dc_id: _MediaPool}, like pyrogram's own client.media_sessions
+_media_pools = weakref.WeakKeyDictionary()
+
+
+async def _authorize(client, dc_id, session):
+    """Imports the client's authorization into a fresh auth key of a foreign DC."""
+    for _ in range(3):
+        exported = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+        try:
+            await session.invoke(raw.functions.auth.ImportAuthorization(id=exported.id, bytes=exported.bytes))
+            return
+        except AuthBytesInvalid:
+            continue
+    raise AuthBytesInvalid
+
+
+@asynccontextmanager
+async def dc_media_sessions(client, dc_id, count):
+    """
+    `count` media connections to `dc_id`, taken from the client's pool and handed
+    back afterwards (closed instead if the transfer failed). For a foreign DC the
+    auth key is created and authorized (export/import) once per client and DC.
+    """
+    pool = _media_pools.setdefault(client, {}).setdefault(dc_id, _MediaPool())
+    test_mode = await client.storage.test_mode()
+    sessions = []
+    try:
+        async with pool.lock:
+            if pool.auth_key is None:
+                if dc_id != await client.storage.dc_id():
+                    auth_key = await Auth(client, dc_id, test_mode).create()
+                    session = Session(client, dc_id, auth_key, test_mode, is_media=True)
+                    await session.start()
+                    sessions.append(session)
+                    await _authorize(client, dc_id, session)
+                    pool.auth_key = auth_key
+                else:
+                    pool.auth_key = await client.storage.auth_key()
+        while pool.idle and len(sessions) < count:
+            sessions.append(pool.idle.pop())
+        while len(sessions) < count:
+            session = Session(client, dc_id, pool.auth_key, test_mode, is_media=True)
+            await session.start()
+            sessions.append(session)
+        yield sessions
+    except BaseException:
+        for session in sessions:
+            await session.stop()
+        sessions = []
+        raise
+    finally:
+        for session in sessions:
+            if len(pool.idle) < MAX_IDLE_MEDIA_SESSIONS:
+                pool.idle.append(session)
+            else:
+                await session.stop()
+
+
+async def close_media_sessions(client):
+    """Stops the pooled media connections of a client that is going away."""
+    for pool in _media_pools.pop(client, {}).values():
+        for session in pool.idle:
+            try:
+                await session.stop()
+            except Exception:
+                pass
+        pool.idle.clear()
+
+
+async def send_uploaded_media(client, chat_id, msg, msg_type, input_file, file_name, caption=None, thumb=None):
+    """
+    Sends an already uploaded InputFile/InputFileBig as the same kind of media as `msg`.
+    `thumb` is a local thumbnail path. Returns the sent Message.
+    """
+    media = get_media(msg, msg_type)
+    attributes = [raw.types.DocumentAttributeFilename(file_name=file_name)]
+    if msg_type == "Video":
+        attributes.insert(0, raw.types.DocumentAttributeVideo(
+            duration=media.duration or 0,
+            w=media.width or 0,
+            h=media.height or 0,
+            supports_streaming=True
+        ))
+    elif msg_type == "Audio":
+        attributes.insert(0, raw.types.DocumentAttributeAudio(
+            duration=media.duration or 0,
+            title=getattr(media, "title", None),
+            performer=getattr(media, "performer", None)
+        ))
+
+    r = await client.invoke(
+        raw.functions.messages.SendMedia(
+            peer=await client.resolve_peer(chat_id),
+            media=raw.types.InputMediaUploadedDocument(
+                mime_type=getattr(media, "mime_type", None) or mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+                file=input_file,
+                thumb=await client.save_file(thumb) if thumb else None,
+                attributes=attributes,
+                force_file=True if msg_type == "Document" else None
+            ),
+            random_id=client.rnd_id(),
+            **await utils.parse_text_entities(client, caption or "", None, None)
+        )
+    )
+
+    for update in r.updates:
+        if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+            return await types.Message._parse(
+                client, update.message,
+                {u.id: u for u in r.users},
+                {c.id: c for c in r.chats}
+            )
@@ -0,0 +1,160 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from config import MEDIA_CACHE_DIR, MEDIA_CACHE_MB
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+class MediaCache:
+    """
+    Optional on-disk cache of downloaded media, keyed by file_unique_id and laid out
+    as <root>/<file_unique_id>/<file name>. Bounded by a byte budget with LRU eviction.
+
+    Readers take a lease (acquire/release) and leased entries are never evicted, so a
+    path handed to an upload stays valid until the upload is done.
+    """
+
+    def __init__(self, root=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # file_unique_id -> (path, size), oldest first
+        self._leases = {}
+        self._size = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _load(self):
+        """Indexes what a previous run left on disk, least recently used first."""
+        self._loaded = True
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root, exist_ok=True)
+            return
+        found = []
+        for uid in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, uid)
+            if uid.startswith(".tmp-"):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            files = os.listdir(entry_dir) if os.path.isdir(entry_dir) else []
+            if len(files) != 1:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                continue
+            path = os.path.join(entry_dir, files[0])
+            stat = os.stat(path)
+            found.append((stat.st_mtime, uid, path, stat.st_size))
+        for _, uid, path, size in sorted(found):
+            self._entries[uid] = (path, size)
+            self._size += size
+        self._evict()
+        logger.info(f"Media cache loaded: {len(self._entries)} files, {self._size} bytes")
+
+    def acquire(self, uid):
+        """Returns the cached path for `uid` (leased) or None."""
+        if not self.enabled:
+            return None
+        if not self._loaded:
+            self._load()
+        entry = self._entries.get(uid)
+        if entry is None or not os.path.exists(entry[0]):
+            if entry is not None:
+                self._drop(uid)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(uid)
+        try:
+            os.utime(entry[0])  # Keeps LRU order across restarts
+        except OSError:
+            pass
+        self._leases[uid] = self._leases.get(uid, 0) + 1
+        return entry[0]
+
+    def release(self, uid):
+        count = self._leases.get(uid, 0) - 1
+        if count > 0:
+            self._leases[uid] = count
+        else:
+            self._leases.pop(uid, None)
+            self._evict()
+
+    def store(self, uid, src_path):
+        """
+        Moves a finished download into the cache and returns its new (leased) path.
+        The entry appears atomically: it is staged in a temp dir and renamed into place.
+        Returns None (file left untouched) if caching is off or the file does not fit.
+        """
+        if not self.enabled:
+            return None
+        if not self._loaded:
+            self._load()
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return None
+        if uid in self._entries:
+            return self.acquire(uid)
+
+        name = os.path.basename(src_path)
+        staging = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        final_dir = os.path.join(self.root, uid)
+        try:
+            os.makedirs(staging)
+            os.replace(src_path, os.path.join(staging, name))
+            os.rename(staging, final_dir)
+        except OSError as e:
+            logger.warning(f"Media cache store failed for {uid}: {e}")
+            if os.path.exists(os.path.join(staging, name)) and not os.path.exists(src_path):
+                os.replace(os.path.join(staging, name), src_path)
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+
+        path = os.path.join(final_dir, name)
+        self._entries[uid] = (path, size)
+        self._size += size
+        self._leases[uid] = self._leases.get(uid, 0) + 1
+        self._evict()
+        return path
+
+    def _drop(self, uid):
+        path, size = self._entries.pop(uid)
+        self._size -= size
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for uid in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if self._leases.get(uid):
+                continue
+            self._drop(uid)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "files": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups * 100) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+media_cache = MediaCache()
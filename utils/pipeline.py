@@ -0,0 +1,85 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+async def run_pipeline(source, download, upload, workers=1, fetch_depth=10, upload_depth=2, should_stop=None, discard=None):
+    """
+    Runs a batch as three stages connected by bounded queues:
+
+        fetch (source) -> download (up to `workers` at once) -> upload (in source order)
+
+    `source` is an async iterator of items, `download(item)` returns the value handed to
+    `upload(value)`. Item N+1 downloads while item N uploads; at most `upload_depth`
+    downloaded-or-downloading items wait for the uploader, so disk usage stays bounded.
+    `should_stop()` is polled between items to end the batch early, and `discard(value)`
+    receives downloads that finished but were never uploaded. When the batch is
+    cancelled, unfinished downloads are cancelled too and awaited, so their own
+    cleanup has run by the time this returns.
+    """
+    loop = asyncio.get_running_loop()
+    fetched = asyncio.Queue(maxsize=max(1, fetch_depth))
+    downloaded = asyncio.Queue(maxsize=max(1, upload_depth))
+    slots = asyncio.Semaphore(max(1, workers))
+    stopped = should_stop or (lambda: False)
+    pending = set()
+
+    async def fetch_stage():
+        try:
+            async for item in source:
+                if stopped():
+                    break
+                await fetched.put(item)
+        except Exception as e:
+            logger.error(f"Pipeline fetch stage failed: {e}")
+        await fetched.put(None)
+
+    async def run_download(item):
+        try:
+            return await download(item)
+        finally:
+            slots.release()
+
+    async def download_stage():
+        while True:
+            item = await fetched.get()
+            if item is None or stopped():
+                break
+            await slots.acquire()
+            task = loop.create_task(run_download(item))
+            pending.add(task)
+            # Tasks are queued in source order, so uploads keep the original order
+            await downloaded.put(task)
+        await downloaded.put(None)
+
+    stages = [loop.create_task(fetch_stage()), loop.create_task(download_stage())]
+    try:
+        while True:
+            task = await downloaded.get()
+            if task is None:
+                break
+            try:
+                result = await task
+            except Exception as e:
+                pending.discard(task)
+                logger.error(f"Pipeline download stage failed: {e}")
+                continue
+            pending.discard(task)
+            await upload(result)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        # Downloads that never reached the uploader are abandoned
+        abandoned = []
+        for task in pending:
+            if not task.done():
+                task.cancel()
+                abandoned.append(task)
+            elif discard and not task.cancelled() and task.exception() is None:
+                await discard(task.result())
+        await asyncio.gather(*stages, *abandoned, return_exceptions=True)
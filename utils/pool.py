@@ -0,0 +1,154 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from pyrogram import Client, raw
+from config import API_ID, API_HASH, USER_POOL_IDLE_TIMEOUT, USER_POOL_HEALTH_INTERVAL
+from logger import LOGGER
+from utils.media import close_media_sessions
+
+logger = LOGGER(__name__)
+
+
+class _PooledClient:
+    __slots__ = ("client", "session", "refs", "last_used", "last_checked")
+
+    def __init__(self, client, session):
+        self.client = client
+        self.session = session
+        self.refs = 0
+        self.last_used = time.time()
+        self.last_checked = time.time()
+
+
+class UserClientPool:
+    """
+    Keeps one connected user-session Client per user id.
+    Every job of the same user shares the connection, idle ones are reaped.
+    """
+
+    def __init__(self, idle_timeout=USER_POOL_IDLE_TIMEOUT, health_interval=USER_POOL_HEALTH_INTERVAL):
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self._clients = {}
+        self._locks = {}
+        self._reaper = None
+        self.hits = 0
+        self.misses = 0
+
+    def _lock(self, user_id):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def _connect(self, user_id, session):
+        client = Client(
+            f"pool_{user_id}",
+            session_string=session,
+            api_hash=API_HASH,
+            api_id=API_ID,
+            in_memory=True,
+            max_concurrent_transmissions=10
+        )
+        await client.connect()
+        return client
+
+    async def _is_healthy(self, entry):
+        if not entry.client.is_connected:
+            return False
+        if time.time() - entry.last_checked < self.health_interval:
+            return True
+        try:
+            await entry.client.invoke(raw.functions.Ping(ping_id=entry.client.rnd_id()))
+            entry.last_checked = time.time()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled session health check failed: {e}")
+            return False
+
+    async def acquire(self, user_id, session):
+        """
+        Returns a connected Client for the user, creating it on a miss.
+        Each acquire must be paired with a release.
+        """
+        self._start_reaper()
+        async with self._lock(user_id):
+            entry = self._clients.get(user_id)
+            if entry and entry.session == session and await self._is_healthy(entry):
+                self.hits += 1
+            else:
+                if entry:
+                    # Session changed (re-login) or connection died
+                    self._clients.pop(user_id, None)
+                    await self._close(entry)
+                self.misses += 1
+                entry = _PooledClient(await self._connect(user_id, session), session)
+                self._clients[user_id] = entry
+            entry.refs += 1
+            entry.last_used = time.time()
+            return entry.client
+
+    def release(self, user_id):
+        entry = self._clients.get(user_id)
+        if entry:
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.time()
+
+    @asynccontextmanager
+    async def lease(self, user_id, session):
+        client = await self.acquire(user_id, session)
+        try:
+            yield client
+        finally:
+            self.release(user_id)
+
+    async def drop(self, user_id):
+        """Closes the user's connection immediately (e.g. on /logout)."""
+        async with self._lock(user_id):
+            entry = self._clients.pop(user_id, None)
+            if entry:
+                await self._close(entry)
+
+    async def _close(self, entry):
+        try:
+            await close_media_sessions(entry.client)
+            await entry.client.disconnect()
+        except Exception:
+            pass
+
+    def _start_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            now = time.time()
+            for user_id, entry in list(self._clients.items()):
+                if entry.refs == 0 and now - entry.last_used >= self.idle_timeout:
+                    async with self._lock(user_id):
+                        if self._clients.get(user_id) is entry and entry.refs == 0:
+                            self._clients.pop(user_id, None)
+                            await self._close(entry)
+                            logger.info(f"Closed idle user session for {user_id}")
+
+    async def close_all(self):
+        if self._reaper:
+            self._reaper.cancel()
+        for user_id in list(self._clients):
+            await self.drop(user_id)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "open": len(self._clients),
+            "in_use": sum(1 for e in self._clients.values() if e.refs),
+        }
+
+
+user_pool = UserClientPool()
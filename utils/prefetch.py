@@ -0,0 +1,35 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+from logger import LOGGER
+from utils.ratelimit import limiter
+
+logger = LOGGER(__name__)
+
+# Telegram accepts at most 200 message ids per messages.getMessages call
+GET_MESSAGES_LIMIT = 200
+
+
+async def iter_messages(acc, chat_id, from_id, to_id, chunk_size=GET_MESSAGES_LIMIT):
+    """
+    Resolves the message range from_id..to_id with one get_messages call per chunk
+    and yields only real content (empty and service messages are skipped).
+    Only one chunk is held in memory at a time.
+    """
+    chunk_size = max(1, min(chunk_size, GET_MESSAGES_LIMIT))
+    for start in range(from_id, to_id + 1, chunk_size):
+        ids = list(range(start, min(start + chunk_size, to_id + 1)))
+        try:
+            messages = await limiter.call(acc, "get", chat_id, lambda: acc.get_messages(chat_id, ids))
+        except Exception as e:
+            logger.error(f"Error fetching messages {ids[0]}-{ids[-1]}: {e}")
+            continue
+
+        if not isinstance(messages, list):
+            messages = [messages]
+
+        for msg in messages:
+            if msg is None or msg.empty or msg.service:
+                continue
+            yield msg
@@ -0,0 +1,81 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import time
+from config import PROGRESS_INTERVAL
+from logger import LOGGER
+from utils.ratelimit import limiter
+
+logger = LOGGER(__name__)
+
+
+class ProgressEntry:
+    __slots__ = ("current", "total", "started", "updated")
+
+    def __init__(self):
+        self.current = 0
+        self.total = 0
+        self.started = time.time()
+        self.updated = self.started
+
+
+class ProgressBus:
+    """
+    In-process registry of running transfers. Transfer callbacks only bump counters;
+    one renderer task per status message turns them into text and edits the message
+    when that text changes. Entries and renderers are dropped when the transfer ends.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._renderers = {}
+        self.edits = 0
+
+    def update(self, key, current, total):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = ProgressEntry()
+        entry.current = current
+        entry.total = total
+        entry.updated = time.time()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def watch(self, key, status_message, formatter, interval=PROGRESS_INTERVAL):
+        """Starts the renderer of `key` on `status_message`; `formatter(entry)` returns its text."""
+        self.stop(key)
+        self._renderers[key] = asyncio.get_running_loop().create_task(
+            self._render(key, status_message, formatter, interval)
+        )
+
+    def stop(self, key):
+        task = self._renderers.pop(key, None)
+        if task:
+            task.cancel()
+        self._entries.pop(key, None)
+
+    async def _render(self, key, status_message, formatter, interval):
+        last_text = None
+        while True:
+            await asyncio.sleep(interval)
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            text = formatter(entry)
+            if text == last_text:
+                continue
+            try:
+                await limiter.call(status_message._client, "edit", status_message.chat.id, lambda: status_message.edit_text(text), retries=0)
+                last_text = text
+                self.edits += 1
+            except Exception as e:
+                logger.debug(f"Progress edit skipped for {key}: {e}")
+
+    def stats(self):
+        return {"active": len(self._entries), "renderers": len(self._renderers), "edits": self.edits}
+
+
+progress_bus = ProgressBus()
@@ -0,0 +1,167 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from pyrogram.errors import FloodWait
+from config import RATE_LIMIT_CHAT, RATE_LIMIT_GLOBAL, FLOOD_WAIT_RETRIES
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+# Starting (rate per second, burst) of each method class: per target chat, per client
+LIMITS = {
+    "copy": ((RATE_LIMIT_CHAT, 3), (RATE_LIMIT_GLOBAL, 30)),
+    "send": ((RATE_LIMIT_CHAT, 3), (RATE_LIMIT_GLOBAL, 30)),
+    "edit": ((1.0, 2), (20.0, 20)),   # Edits and deletes of messages
+    "get": ((5.0, 10), (30.0, 30)),
+}
+# Raw methods named in pyrogram's "Waiting for N seconds" log, by class
+METHOD_CLASSES = {
+    "messages.SendMessage": "send",
+    "messages.SendMedia": "send",
+    "messages.SendMultiMedia": "send",
+    "messages.ForwardMessages": "copy",
+    "messages.EditMessage": "edit",
+    "messages.DeleteMessages": "edit",
+    "channels.DeleteMessages": "edit",
+    "messages.GetMessages": "get",
+    "channels.GetMessages": "get",
+}
+MAX_BUCKETS = 10000
+GROWTH_STREAK = 20   # Calls without a FloodWait before a rate goes up by 10%
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to FloodWait: a flood blocks the bucket for the
+    time Telegram asked for and halves its rate, every GROWTH_STREAK clean calls
+    raise it by 10% again, up to 4x the starting rate.
+    """
+    __slots__ = ("rate", "min_rate", "max_rate", "burst", "tokens", "updated", "blocked_until", "streak")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.min_rate = rate / 16
+        self.max_rate = rate * 4
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.streak = 0
+
+    def reserve(self):
+        """Takes a token, going into debt if none is left. Returns the seconds to wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate, self.blocked_until - now)
+
+    def flood(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+        self.streak = 0
+
+    def success(self):
+        self.streak += 1
+        if self.streak >= GROWTH_STREAK:
+            self.streak = 0
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+class _FloodLogHandler(logging.Handler):
+    """Feeds the FloodWaits pyrogram sleeps through by itself into the client-wide buckets."""
+
+    def __init__(self, limiter):
+        super().__init__(logging.WARNING)
+        self.limiter = limiter
+
+    def emit(self, record):
+        if "Waiting for" not in str(record.msg) or not isinstance(record.args, tuple) or len(record.args) != 3:
+            return
+        client_name, seconds, method = record.args
+        kind = METHOD_CLASSES.get(method)
+        if kind:
+            self.limiter.flood_sleeps += 1
+            self.limiter._bucket(client_name, kind, None).flood(float(seconds))
+
+
+class RateLimiter:
+    """
+    Paces Telegram calls by (client, method class, target chat). A call takes a
+    token from its chat's bucket and from the client-wide bucket of its class and
+    only waits if either is empty or blocked. A FloodWait slows both buckets down
+    and the call is retried once the wait is over.
+    """
+
+    def __init__(self, retries=FLOOD_WAIT_RETRIES):
+        self.retries = retries
+        self._buckets = OrderedDict()   # (client name, class, chat id or None) -> TokenBucket
+        self._stats = {kind: {"calls": 0, "delayed": 0, "wait": 0.0, "max_wait": 0.0, "floods": 0} for kind in LIMITS}
+        self.flood_sleeps = 0
+        logging.getLogger("pyrogram.session.session").addHandler(_FloodLogHandler(self))
+
+    def _bucket(self, client_name, kind, chat_id):
+        key = (client_name, kind, chat_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*LIMITS[kind][0 if chat_id is not None else 1])
+            if len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def call(self, client, kind, chat_id, func, retries=None):
+        """Runs `func()`, one `kind` call of `client` to `chat_id`, as soon as the buckets allow it."""
+        name = getattr(client, "name", None) or id(client)
+        stats = self._stats[kind]
+        retries = self.retries if retries is None else retries
+        stats["calls"] += 1
+        attempt = 0
+        while True:
+            buckets = (self._bucket(name, kind, chat_id), self._bucket(name, kind, None))
+            wait = max([bucket.reserve() for bucket in buckets])
+            waited = 0.0
+            while wait > 0:
+                await asyncio.sleep(wait)
+                waited += wait
+                # A FloodWait seen meanwhile pushes the slot back
+                wait = max(bucket.blocked_until for bucket in buckets) - time.monotonic()
+            if waited:
+                stats["delayed"] += 1
+                stats["wait"] += waited
+                stats["max_wait"] = max(stats["max_wait"], waited)
+            try:
+                result = await func()
+            except FloodWait as e:
+                stats["floods"] += 1
+                for bucket in buckets:
+                    bucket.flood(e.value)
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                logger.warning(f"FloodWait of {e.value}s on {kind} to {chat_id}, retry {attempt}/{retries}")
+                continue
+            for bucket in buckets:
+                bucket.success()
+            return result
+
+    def stats(self):
+        classes = {}
+        for kind, counters in self._stats.items():
+            rates = [bucket.rate for (_, k, chat), bucket in self._buckets.items() if k == kind and chat is None]
+            classes[kind] = dict(
+                counters,
+                avg_wait=counters["wait"] / counters["delayed"] if counters["delayed"] else 0.0,
+                rate=min(rates) if rates else LIMITS[kind][1][0],
+            )
+        return {"buckets": len(self._buckets), "flood_sleeps": self.flood_sleeps, "classes": classes}
+
+
+limiter = RateLimiter()
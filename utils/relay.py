@@ -0,0 +1,100 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+from collections import deque
+from config import RELAY_BUFFER_MB
+from utils.media import PART_SIZE, BIG_FILE_THRESHOLD
+from utils.upload import uploader
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+class RelayError(Exception):
+    pass
+
+
+class RelayBuffer:
+    """
+    Bounded in-memory FIFO of byte chunks between the user-session download
+    and the bot upload. Writers block while `capacity` bytes are buffered.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._chunks = deque()
+        self._size = 0
+        self._eof = False
+        self._error = None
+        self._cond = asyncio.Condition()
+
+    async def write(self, data):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._size < self.capacity or self._eof)
+            if self._eof:
+                raise RelayError("Buffer closed")
+            self._chunks.append(data)
+            self._size += len(data)
+            self._cond.notify_all()
+
+    async def close(self, error=None):
+        async with self._cond:
+            self._eof = True
+            self._error = error
+            self._cond.notify_all()
+
+    async def read(self, n):
+        """Returns exactly n bytes, fewer only at the end of the stream."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._size >= n or self._eof)
+            if self._error:
+                raise self._error
+            out = bytearray()
+            while self._chunks and len(out) < n:
+                chunk = self._chunks.popleft()
+                take = n - len(out)
+                if len(chunk) > take:
+                    self._chunks.appendleft(chunk[take:])
+                    chunk = chunk[:take]
+                out += chunk
+            self._size -= len(out)
+            self._cond.notify_all()
+            return bytes(out)
+
+
+def can_relay(msg_type, file_size):
+    """Streaming needs a known size above the big-file threshold (saveBigFilePart)."""
+    return msg_type in ("Document", "Video", "Audio") and file_size > BIG_FILE_THRESHOLD
+
+
+async def relay_media(acc, client, msg, file_size, file_name, progress=None, progress_args=()):
+    """
+    Streams the media of `msg` from the user client `acc` straight into big-file
+    parts uploaded by the bot `client` with the parallel uploader, without
+    touching the disk. Returns the InputFileBig to send.
+    """
+    buffer = RelayBuffer(max(RELAY_BUFFER_MB, 2) * 1024 * 1024)
+
+    async def produce():
+        try:
+            async for chunk in acc.stream_media(msg):
+                await buffer.write(chunk)
+        except Exception as e:
+            await buffer.close(RelayError(f"Source stream failed: {e}"))
+            return
+        await buffer.close()
+
+    async def read(part):
+        data = await buffer.read(PART_SIZE)
+        if len(data) != min(PART_SIZE, file_size - part * PART_SIZE):
+            raise RelayError(f"Source ended after {part * PART_SIZE + len(data)} of {file_size} bytes")
+        return data
+
+    producer = asyncio.get_running_loop().create_task(produce())
+    try:
+        return await uploader.upload_parts(client, file_size, file_name, read, progress, progress_args)
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
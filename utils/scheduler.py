@@ -0,0 +1,199 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import time
+from collections import deque
+from config import MAX_ACTIVE_JOBS, PREMIUM_BURST
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+class Job:
+    __slots__ = ("user_id", "premium", "run", "submitted", "started", "cancelled", "task")
+
+    def __init__(self, user_id, run, premium):
+        self.user_id = user_id
+        self.run = run
+        self.premium = premium
+        self.submitted = time.time()
+        self.started = None
+        self.cancelled = None
+        self.task = None
+
+
+class JobScheduler:
+    """
+    Runs link jobs through a fixed number of global slots.
+
+    Each user has a FIFO queue and at most one running job. Users waiting for a
+    slot sit in one of two round-robin lanes; the premium lane is served first,
+    but after `premium_burst` premium starts in a row the free lane gets a turn.
+
+    The running jobs double as the per-user task registry: cancel() cancels the
+    job's asyncio task, so it stops at whatever it is awaiting, and the time until
+    its slot is free again is recorded.
+    """
+
+    def __init__(self, slots=MAX_ACTIVE_JOBS, premium_burst=PREMIUM_BURST):
+        self.slots = max(1, slots)
+        self.premium_burst = max(1, premium_burst)
+        self._queues = {}
+        self._lanes = {True: deque(), False: deque()}
+        self._running = {}
+        self._burst = 0
+        self.closing = False
+        self.started = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.cancels = 0
+        self.total_cancel = 0.0
+        self.max_cancel = 0.0
+
+    def submit(self, user_id, run, premium=False):
+        """
+        Queues `run()` (a coroutine function) for the user.
+        Returns the queue position, 0 if the job started right away.
+        """
+        job = Job(user_id, run, premium)
+        queue = self._queues.setdefault(user_id, deque())
+        queue.append(job)
+        if user_id not in self._running and len(queue) == 1:
+            self._lanes[premium].append(user_id)
+        self._dispatch()
+        return self.position(job)
+
+    def _pick_lane(self, lanes):
+        if lanes[True] and (self._burst < self.premium_burst or not lanes[False]):
+            self._burst += 1
+            return True
+        if lanes[False]:
+            self._burst = 0
+            return False
+        return None
+
+    def _dispatch(self):
+        while len(self._running) < self.slots and not self.closing:
+            lane = self._pick_lane(self._lanes)
+            if lane is None:
+                return
+            user_id = self._lanes[lane].popleft()
+            job = self._queues[user_id].popleft()
+            job.started = time.time()
+            wait = job.started - job.submitted
+            self.started += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._running[user_id] = job
+            job.task = asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job):
+        try:
+            await job.run()
+        except asyncio.CancelledError:
+            if job.cancelled is None:
+                raise
+        except Exception as e:
+            logger.error(f"Job of user {job.user_id} failed: {e}")
+        finally:
+            self._running.pop(job.user_id, None)
+            if job.cancelled is not None:
+                latency = time.time() - job.cancelled
+                self.cancels += 1
+                self.total_cancel += latency
+                self.max_cancel = max(self.max_cancel, latency)
+                logger.info(f"Job of user {job.user_id} cancelled, slot freed in {latency:.2f}s")
+            queue = self._queues.get(job.user_id)
+            if queue:
+                # Back of the lane: round-robin between users
+                self._lanes[queue[0].premium].append(job.user_id)
+            else:
+                self._queues.pop(job.user_id, None)
+            self._dispatch()
+
+    def position(self, job):
+        """1-based place of a queued job in the expected start order (0 if running)."""
+        if job.started is not None:
+            return 0
+        lanes = {lane: deque(users) for lane, users in self._lanes.items()}
+        queues = {user_id: deque(queue) for user_id, queue in self._queues.items()}
+        # Users with a running job rejoin their lane once it finishes
+        for user_id in self._running:
+            if queues.get(user_id):
+                lanes[queues[user_id][0].premium].append(user_id)
+        saved_burst = self._burst
+        try:
+            rank = 0
+            while True:
+                lane = self._pick_lane(lanes)
+                if lane is None:
+                    return rank + 1
+                user_id = lanes[lane].popleft()
+                queued = queues[user_id].popleft()
+                rank += 1
+                if queued is job:
+                    return rank
+                if queues[user_id]:
+                    lanes[queues[user_id][0].premium].append(user_id)
+        finally:
+            self._burst = saved_burst
+
+    def cancel_queued(self, user_id):
+        """Drops the user's waiting jobs. Returns how many were removed."""
+        queue = self._queues.pop(user_id, None)
+        if not queue:
+            return 0
+        for lane in self._lanes.values():
+            if user_id in lane:
+                lane.remove(user_id)
+        return len(queue)
+
+    def cancel(self, user_id):
+        """
+        Drops the user's queued jobs and cancels the running one.
+        Returns (whether a running job was cancelled, number of queued jobs dropped).
+        """
+        dropped = self.cancel_queued(user_id)
+        job = self._running.get(user_id)
+        if job is None or job.task.done():
+            return False, dropped
+        if job.cancelled is None:
+            job.cancelled = time.time()
+            job.task.cancel()
+        return True, dropped
+
+    async def shutdown(self):
+        """Drops every queued job, cancels the running ones and waits until they have unwound."""
+        self.closing = True
+        self._queues.clear()
+        for lane in self._lanes.values():
+            lane.clear()
+        tasks = [job.task for job in self._running.values() if not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def is_busy(self, user_id):
+        return user_id in self._running or bool(self._queues.get(user_id))
+
+    def stats(self):
+        now = time.time()
+        waiting = [job for queue in self._queues.values() for job in queue]
+        return {
+            "slots": self.slots,
+            "running": len(self._running),
+            "queued": len(waiting),
+            "queued_premium": sum(1 for job in waiting if job.premium),
+            "oldest_wait": max((now - job.submitted for job in waiting), default=0),
+            "avg_wait": self.total_wait / self.started if self.started else 0,
+            "max_wait": self.max_wait,
+            "started": self.started,
+            "cancels": self.cancels,
+            "avg_cancel": self.total_cancel / self.cancels if self.cancels else 0,
+            "max_cancel": self.max_cancel,
+        }
+
+
+scheduler = JobScheduler()
@@ -0,0 +1,98 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import os
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+
+class _Flight:
+    __slots__ = ("key", "variant", "waiters")
+
+    def __init__(self, key, variant):
+        self.key = key
+        self.variant = variant
+        self.waiters = []
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent transfers of the same source post across users.
+
+    A job becomes the leader of a key only when its transfer actually starts, and
+    followers can only join a running transfer. A leader never waits on another
+    job, so two batches that overlap in opposite order cannot deadlock.
+
+    Flights are keyed by the source file, so every job shares the download. The
+    uploaded file_id carries the leader's thumbnail, so only followers asking for
+    the same variant get it; the others get the downloaded file (or nothing, after
+    a relay) and upload it themselves.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.bytes_saved = 0
+
+    def follow(self, key, target_dir, variant=None):
+        """
+        Joins the running transfer of `key`. Returns a future resolving to the shared
+        result ({'path': ...} linked into target_dir, or a file_id entry of the same
+        `variant`), None if there is nothing to share; or returns None right away
+        when nothing is in flight.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            return None
+        self.coalesced += 1
+        future = asyncio.get_running_loop().create_future()
+        flight.waiters.append((future, target_dir, variant))
+        return future
+
+    def lead(self, key, variant=None):
+        """Registers the caller as the transfer of `key`. Returns None if one is already running."""
+        if key in self._flights:
+            return None
+        flight = self._flights[key] = _Flight(key, variant)
+        self.leaders += 1
+        return flight
+
+    def finish(self, flight, path=None, entry=None):
+        """Hands the leader's result (downloaded file or uploaded file_id entry) to its followers."""
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        for future, target_dir, variant in flight.waiters:
+            if future.done():
+                continue
+            result = None
+            if entry and variant == flight.variant:
+                result = entry
+            elif path:
+                # A hard link keeps the bytes alive after the leader cleans its temp dir
+                try:
+                    os.makedirs(target_dir, exist_ok=True)
+                    dest = os.path.join(target_dir, os.path.basename(path))
+                    os.link(path, dest)
+                    result = {'path': dest}
+                except OSError as e:
+                    logger.warning(f"Could not share downloaded file {path}: {e}")
+            future.set_result(result)
+        flight.waiters.clear()
+
+    def saved(self, nbytes):
+        self.bytes_saved += nbytes or 0
+
+    def stats(self):
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+transfers = SingleFlight()
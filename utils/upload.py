@@ -0,0 +1,145 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import math
+import mmap
+import time
+from pyrogram import raw
+from pyrogram.errors import FloodWait
+from config import PARALLEL_UPLOAD_CONNECTIONS, PARALLEL_UPLOAD_WINDOW
+from logger import LOGGER
+from utils.download import FloodThrottle
+from utils.media import PART_SIZE, BIG_FILE_THRESHOLD, call_progress, dc_media_sessions
+
+logger = LOGGER(__name__)
+
+
+class ParallelUploader:
+    """
+    Uploads files as saveBigFilePart parts, up to `window` parts in flight spread
+    over `connections` media connections. Local files are read as memoryview
+    slices of an mmap, so no per-part buffers are allocated; the streaming relay
+    feeds its parts through the same workers.
+    """
+
+    def __init__(self, connections=PARALLEL_UPLOAD_CONNECTIONS, window=PARALLEL_UPLOAD_WINDOW):
+        self.connections = connections
+        self.window = window
+        self.uploads = 0
+        self.failures = 0
+        self.floods = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.last_speed = 0.0
+
+    def can_upload(self, msg_type, file_size):
+        return self.connections > 0 and msg_type in ("Document", "Video", "Audio") and file_size > BIG_FILE_THRESHOLD
+
+    async def upload_parts(self, client, file_size, file_name, read, progress=None, progress_args=()):
+        """
+        Uploads `file_size` bytes through the bot `client`, part N being `await read(N)`.
+        Parts are read in order, one at a time. Returns the InputFileBig to send.
+        """
+        total_parts = math.ceil(file_size / PART_SIZE)
+        file_id = client.rnd_id()
+        workers_count = min(max(1, self.window), total_parts)
+        throttle = FloodThrottle(workers_count)
+        reading = asyncio.Lock()
+        retry = []
+        next_part = 0
+        done = 0
+        started = time.perf_counter()
+
+        async def claim():
+            nonlocal next_part
+            if retry:
+                return retry.pop()
+            async with reading:
+                if next_part >= total_parts:
+                    return None
+                part = next_part
+                next_part += 1
+                return part, await read(part)
+
+        async def worker(session):
+            nonlocal done
+            while True:
+                claimed = await claim()
+                if claimed is None:
+                    return
+                part, data = claimed
+                await throttle.acquire()
+                flood = None
+                try:
+                    await session.invoke(
+                        raw.functions.upload.SaveBigFilePart(
+                            file_id=file_id,
+                            file_part=part,
+                            file_total_parts=total_parts,
+                            bytes=data
+                        ),
+                        sleep_threshold=0
+                    )
+                except FloodWait as e:
+                    flood = e
+                finally:
+                    await throttle.release(flood.value if flood else None)
+                if flood:
+                    # The throttle holds every worker until the wait is over
+                    retry.append((part, data))
+                    self.floods += 1
+                    continue
+                done += len(data)
+                await call_progress(progress, done, file_size, progress_args)
+
+        try:
+            connections = max(1, min(self.connections, workers_count))
+            async with dc_media_sessions(client, await client.storage.dc_id(), connections) as sessions:
+                workers = [
+                    asyncio.get_running_loop().create_task(worker(sessions[i % len(sessions)]))
+                    for i in range(workers_count)
+                ]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        except BaseException:
+            self.failures += 1
+            raise
+
+        elapsed = time.perf_counter() - started
+        self.uploads += 1
+        self.bytes += file_size
+        self.seconds += elapsed
+        self.last_speed = file_size / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Uploaded {file_name}: {file_size / 1048576:.1f} MB in {elapsed:.1f}s ({self.last_speed / 1048576:.2f} MB/s)")
+        return raw.types.InputFileBig(id=file_id, parts=total_parts, name=file_name)
+
+    async def upload(self, client, path, file_name, progress=None, progress_args=()):
+        """Uploads the local file `path`, its parts sliced out of an mmap."""
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                async def read(part):
+                    return view[part * PART_SIZE:(part + 1) * PART_SIZE]
+
+                return await self.upload_parts(client, len(view), file_name, read, progress, progress_args)
+            finally:
+                view.release()
+
+    def stats(self):
+        return {
+            "uploads": self.uploads,
+            "failures": self.failures,
+            "floods": self.floods,
+            "bytes": self.bytes,
+            "avg_speed": self.bytes / self.seconds if self.seconds else 0.0,
+            "last_speed": self.last_speed,
+        }
+
+
+uploader = ParallelUploader()
@@ -0,0 +1,88 @@
+# Rexbots
+# Don't Remove Credit
+# Telegram Channel @RexBots_Official
+
+import asyncio
+import datetime
+from config import USAGE_FLUSH_INTERVAL
+from database.db import db
+from logger import LOGGER
+
+logger = LOGGER(__name__)
+
+FIELDS = ("saves", "bytes_down", "bytes_up", "failures")
+
+
+class UsageRecorder:
+    """
+    Write-behind usage analytics. Transfers only bump in-memory counters per
+    (user, day); a background task writes them out every `interval` seconds with
+    one bulk write per collection, and close() flushes what is left on shutdown.
+    """
+
+    def __init__(self, interval=USAGE_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending = {}   # (user_id, day) -> {field: count}
+        self._flusher = None
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+
+    def record(self, user_id, **counts):
+        self._start_flusher()
+        key = (int(user_id), datetime.date.today().isoformat())
+        bucket = self._pending.get(key)
+        if bucket is None:
+            bucket = self._pending[key] = dict.fromkeys(FIELDS, 0)
+        for field, count in counts.items():
+            bucket[field] += count
+
+    def pending(self, user_id, day=None):
+        """Counters of the user not written yet, for one day or all of them."""
+        total = dict.fromkeys(FIELDS, 0)
+        for (uid, bucket_day), bucket in self._pending.items():
+            if uid == int(user_id) and (day is None or bucket_day == day):
+                for field in FIELDS:
+                    total[field] += bucket[field]
+        return total
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await db.flush_usage(batch)
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Usage flush failed, keeping {len(batch)} rows for the next one: {e}")
+            for key, bucket in batch.items():
+                merged = self._pending.setdefault(key, dict.fromkeys(FIELDS, 0))
+                for field in FIELDS:
+                    merged[field] += bucket[field]
+
+    def _start_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def close(self):
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "errors": self.errors,
+        }
+
+
+usage = UsageRecorder()